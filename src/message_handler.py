@@ -4,24 +4,106 @@ from datetime import datetime, time, date
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ValidationError, parse_obj_as
 from pydantic.utils import lenient_issubclass, lenient_isinstance
 from src.schema import MessageSchema
 import re
 from collections.abc import Callable
 import operator
+from functools import lru_cache
+import bisect
+
+# load environmental variables
+load_dotenv(dotenv_path=Path(__file__).parent.parent.resolve() / ".env")
+
+FORMAT = os.getenv('FORMAT')
+MESSAGE_LENGTH_HEADER_LENGTH = int(os.getenv('MESSAGE_LENGTH_HEADER_LENGTH'))
+
+
+@lru_cache(maxsize=128)
+def _compile_query(_query: str) -> tuple[str, tuple[str, ...], tuple[str, ...], str | None]:
+    """
+    Validate the query string (see MessageHandler.query) and break it down into the action and its parts. The same
+    query strings are used over and over with different values, hence the result is cached.
+
+    Example:
+
+        'UPDATE broadcasted.message_sent_at={} WHERE message_id=={}'
+        return 'UPDATE WHERE', ('broadcasted.message_sent_at={}',), ('message_id=={}',), None
+
+    :param str _query: string format query
+    :return: action, fields to be updated, conditions, field of interest (DELETE IN(...) only)
+    """
+
+    # check if only allowed characters are present in the _query
+    allowed_characters = re.compile(r'^[A-Za-z,._\-<>=!(){}\s]+')
+
+    if not allowed_characters.match(_query).group() == _query:
+
+        # raise error if not allowed characters
+        raise ValueError("Not allowed characters detected in the query.")
+
+    if not (_query.count(',') == _query.count(', ') and _query.count(' ,') == 0):
+
+        # raise error if any ',' is written without space after or with space before it
+        raise ValueError("Semicolons must have space after and no space before itself.")
+
+    # replace 'AND' with semicolons
+    _query = _query.replace(' AND ', ', ')
+
+    # check if capitalized words are only the allowed_methods
+    allowed_methods = ["GET", "UPDATE", "DELETE", "WHERE", "ALL", "IN"]
+
+    for word in _query.split(' '):
+        if word.isupper() and word not in allowed_methods:
+            raise ValueError
+
+    # first rule out the most basic possibilities
+    if "GET ALL" in _query:
+        return "GET ALL", (), (), None
+
+    elif "DELETE ALL" in _query:
+        return "DELETE ALL", (), (), None
+
+    # Here we are left with 'GET WHERE ...', 'UPDATE ALL ...', 'UPDATE ... WHERE ...', 'DELETE WHERE ...',
+    # 'DELETE IN(...) WHERE ...'
+    query_items = tuple(_query.split(' '))
+
+    if "GET WHERE " in _query:
+        # all args are conditions
+        return "GET WHERE", (), query_items[2:], None
+
+    elif "UPDATE ALL " in _query:
+        # no conditions, all args are fields to be updated
+        return "UPDATE ALL", query_items[2:], (), None
+
+    elif "UPDATE " in _query and " WHERE " in _query:
+        where_index = query_items.index("WHERE")
+        return "UPDATE WHERE", query_items[1:where_index], query_items[where_index + 1:], None
+
+    elif "DELETE WHERE " in _query:
+        return "DELETE WHERE", (), query_items[2:], None
+
+    elif "DELETE IN(" in _query and ") WHERE " in _query:
+        # foi - field of interest - extract whatever is within 'IN'
+        return "DELETE IN", (), query_items[3:], query_items[1][3:-1]
+
+    else:
+
+        # some other exception with the query happened
+        raise Exception(f"Cannot find an action for given query {_query}")
 
 
 class MessageHandler:
     def __init__(self, message_schema: Type[BaseModel], *, sort_messages_by_date: bool = False):
-        # The list will store all messages
-        self.waiting_messages = []
-
         # key to the field by which messages will be sorted, will be initialized as soon as the first message will be
         # added to the list
         self.sort_messages_by_date = sort_messages_by_date
         self.timestamp_key = None
 
+        # The list will store all messages
+        self.waiting_messages = []
+
         # The schema class can be referenced throughout the class using self.Schema
         self.Schema = message_schema
 
@@ -31,11 +113,26 @@ class MessageHandler:
 
         self.key_err_msg = f
 
-        # Initialize environmental variables
-        dotenv_path = Path(__file__).parent.parent.resolve() / ".env"
-        load_dotenv(dotenv_path=dotenv_path)
-        self.FORMAT = os.getenv('FORMAT')
-        self.MESSAGE_LENGTH_HEADER_LENGTH = int(os.getenv('MESSAGE_LENGTH_HEADER_LENGTH'))
+        # environmental variables (loaded once, when the module is imported)
+        self.FORMAT = FORMAT
+        self.MESSAGE_LENGTH_HEADER_LENGTH = MESSAGE_LENGTH_HEADER_LENGTH
+
+    @property
+    def waiting_messages(self) -> list[dict]:
+        return self._waiting_messages
+
+    @waiting_messages.setter
+    def waiting_messages(self, messages: list[dict]) -> None:
+        """
+        Replace the list of waiting messages. If sort_messages_by_date is set the list is sorted straight away - both
+        append_message() (bisect.insort) and get_messages() (bisection of the date range) rely on that order.
+
+        :param messages: list of messages (dicts) in any order
+        :return:
+        """
+        self._waiting_messages = messages
+
+        self.__sort_waiting_messages()
 
     def get_schema(self, *, schema_as: str = 'dict', get_only: str | None = None) -> Any:
         schema_json = self.Schema.schema_json(indent=3)
@@ -55,11 +152,15 @@ class MessageHandler:
             else:
                 raise Exception(f"The parameter 'schema_as' can only take values 'json', 'dict'. {schema_as} was given.")
 
-    def append_message(self, **kwargs) -> None:
+    def append_message(self, *, _validate: bool = True, **kwargs) -> None:
         try:
 
-            # get dictionary that was given via **kwargs if it matches the schema
-            message = self.Schema(**kwargs).dict()
+            # get dictionary that was given via **kwargs if it matches the schema; trusted messages (_validate=False)
+            # skip the validators and are only filled with the schema defaults
+            if _validate:
+                message = self.Schema(**kwargs).dict()
+            else:
+                message = self.Schema.construct(**kwargs).dict()
 
         except ValidationError as err:
 
@@ -67,17 +168,49 @@ class MessageHandler:
 
         else:
 
-            # append the message to the list of waiting messages
-            self.waiting_messages.append(message)
-
             if self.sort_messages_by_date:
                 # initialize timestamp_key if there is none
                 if self.timestamp_key is None:
                     # the [0] at the end = we want only the first list of keys (multiple are being returned)
-                    self.timestamp_key = SortByDate.find_datetime_value_key(self.waiting_messages[0])[0]
+                    self.timestamp_key = SortByDate.find_datetime_value_key(message)[0]
 
-                # sort messages by date
-                self.waiting_messages = SortByDate.sort_by_date(self.waiting_messages, *self.timestamp_key)
+                # the list is kept sorted by date, hence the message only needs to be inserted at the right place
+                bisect.insort(self.waiting_messages, message, key=SortByDate.get_sort_key(*self.timestamp_key))
+
+            else:
+
+                # append the message to the list of waiting messages
+                self.waiting_messages.append(message)
+
+    def append_messages(self, messages: list[dict]) -> None:
+        """
+        Validate all the messages against the schema and append them to the list of waiting messages. Unlike calling
+        append_message() for each of them, the list is sorted only once. If any of the messages does not match the
+        schema, none of them is appended.
+
+        :param messages: list of messages (dictionaries) matching the schema
+        :return:
+        """
+        validated = parse_obj_as(list[self.Schema], messages)
+
+        self.waiting_messages.extend(message.dict() for message in validated)
+
+        self.__sort_waiting_messages()
+
+    def __sort_waiting_messages(self) -> None:
+        """
+        Sort the list of waiting messages by date if sort_messages_by_date is set.
+
+        :return:
+        """
+        if self.sort_messages_by_date and self.waiting_messages:
+            # initialize timestamp_key if there is none
+            if self.timestamp_key is None:
+                # the [0] at the end = we want only the first list of keys (multiple are being returned)
+                self.timestamp_key = SortByDate.find_datetime_value_key(self.waiting_messages[0])[0]
+
+            # sort messages by date
+            self._waiting_messages = SortByDate.sort_by_date(self._waiting_messages, *self.timestamp_key)
 
     def __is_in_schema(
             self,
@@ -208,40 +341,51 @@ class MessageHandler:
             # dictionary
             _cond = {k if at is None else f"{at}.{k}": v for k, v in conditions.items()}
 
+        # break down the conditions once, they are the same for every message
+        parsed_cond: list[tuple[Callable, Any, list[str]]] = []
+
+        for key, val in _cond.items():
+
+            # if the input _cond was of the form {'field.path': '...', 'some_field': '...', ...} the convert each
+            # value to tuple; i.e. {'field.path': (operator.eq, '...'), 'some_field': (operator.eq, '...'), ...}.
+            # Default operator function operator.eq
+            if not isinstance(val, tuple):
+                val = (operator.eq, val)
+
+            func, val = val
+
+            # break down the key into names of fields
+            field_path = [fname for fname in key.split('.') if fname != '']
+
+            # check if requested fields exist in schema and if their value has an appropriate type
+            self.__is_in_schema(
+                fields=field_path,
+                schema_class=self.Schema,
+                check_if_modifiable=False,
+                value=val
+            )
+
+            if len(field_path) not in (1, 2):
+                # if someone specifies another level of embedding, like 'some_field.some_other_field_field' - no
+                # support for that at the moment
+                raise ValueError(f"Cannot convert given string {key} into a valid path to the field.")
+
+            parsed_cond.append((func, val, field_path))
+
         # initiate lists for messages that meet all conditions and their indices
         indices: list[tuple[int, int | None]] = []
         messages_found: list[dict] = []
 
-        # iterate over all messages
-        for i, message in enumerate(self.waiting_messages):
+        # iterate over all messages (or just the ones within the date range)
+        for i in range(*self.__get_date_range(parsed_cond)):
+            message = self.waiting_messages[i]
 
             # count the number of times the message met the condition, then compare with number of conditions
             passing = 0
             sub_indices = []
 
             # iterate over conditions
-            for key, val in _cond.items():
-
-                # if the input _cond was of the form {'field.path': '...', 'some_field': '...', ...} the convert each
-                # value to tuple; i.e. {'field.path': (operator.eq, '...'), 'some_field': (operator.eq, '...'), ...}.
-                # Default operator function operator.eq
-                if not isinstance(val, tuple):
-                    val = (operator.eq, val)
-
-                func, val = val
-
-                # break down the key into names of fields
-                field_path = [fname for fname in key.split('.') if fname != '']
-
-                # print(f"field_path @ get_messages = {field_path}")
-
-                # check if requested fields exist in schema and if their value has an appropriate type
-                self.__is_in_schema(
-                    fields=field_path,
-                    schema_class=self.Schema,
-                    check_if_modifiable=False,
-                    value=val
-                )
+            for func, val, field_path in parsed_cond:
 
                 if len(field_path) == 1:
                     # it is 'normal' field without embedding
@@ -249,7 +393,7 @@ class MessageHandler:
                     if func(message[field_path[0]], val):
                         passing += 1
 
-                elif len(field_path) == 2:
+                else:
                     # field with embedding - iterable (list/set) or dict-like
 
                     if isinstance(message[field_path[0]], (list, set)):
@@ -257,7 +401,7 @@ class MessageHandler:
 
                         for j, elem in enumerate(message[field_path[0]]):
 
-                            if func(message[field_path[0]][j][field_path[1]], val):
+                            if func(elem[field_path[1]], val):
                                 passing += 1
                                 sub_indices.append(j)
 
@@ -267,11 +411,6 @@ class MessageHandler:
                         if func(message[field_path[0]][field_path[1]], val):
                             passing += 1
 
-                else:
-                    # if someone specifies another level of embedding, like 'some_field.some_other_field_field' - no
-                    # support for that at the moment
-                    raise ValueError(f"Cannot convert given string {key} into a valid path to the field.")
-
             else:
                 # after each for-loop iterating over conditions check 'passing' and 'sub_indices' and assess whether to
                 # add the message and indices to the list or not
@@ -288,6 +427,38 @@ class MessageHandler:
 
         return indices, messages_found
 
+    def __get_date_range(self, parsed_cond: list[tuple[Callable, Any, list[str]]]) -> tuple[int, int]:
+        """
+        If messages are kept sorted by date (append_message(), append_messages() and the waiting_messages setter
+        maintain the order), find the slice of waiting_messages that can meet the conditions on the date field
+        (>, >=, <, <=) with bisection. Otherwise, or if there are no such conditions, it is the whole list.
+
+        :param parsed_cond: list of (func, val, field_path) tuples as in get_messages()
+        :return: start and stop index of the slice
+        """
+        start, stop = 0, len(self.waiting_messages)
+
+        if not self.sort_messages_by_date or self.timestamp_key is None:
+            return start, stop
+
+        sort_key = SortByDate.get_sort_key(*self.timestamp_key)
+
+        for func, val, field_path in parsed_cond:
+
+            if field_path != self.timestamp_key:
+                continue
+
+            if func is operator.ge:
+                start = max(start, bisect.bisect_left(self.waiting_messages, val, key=sort_key))
+            elif func is operator.gt:
+                start = max(start, bisect.bisect_right(self.waiting_messages, val, key=sort_key))
+            elif func is operator.le:
+                stop = min(stop, bisect.bisect_right(self.waiting_messages, val, key=sort_key))
+            elif func is operator.lt:
+                stop = min(stop, bisect.bisect_left(self.waiting_messages, val, key=sort_key))
+
+        return start, stop
+
     def update_messages(
             self,
             *, field_name: str,
@@ -354,20 +525,22 @@ class MessageHandler:
 
     def get_not_broadcasted_messages(self, recipient_name: str) -> list[dict | None]:
         """
-        Old method. Wraps around get_messages(). It extracts messages with matching recipient name if they are connected
-        - the messages that were not sent (client_connected=True, message_sent_at=None).
+        Old method. It extracts the messages not sent to the recipient yet - the ones with a broadcasted entry for the
+        recipient whose message_sent_at is None. Entries of other recipients do not matter.
 
         :param str recipient_name: client_name
         :return: list of messages not sent to the client
         """
 
-        _, messages = self.get_messages(
-            at="broadcasted",
-            client_name=recipient_name,
-            message_sent_at=None
-        )
-
-        return messages
+        # single pass over the messages instead of going through get_messages(at="broadcasted",
+        # client_name=recipient_name, message_sent_at=None) and its generic condition handling
+        return [
+            message for message in self.waiting_messages
+            if any(
+                recipient["client_name"] == recipient_name and recipient["message_sent_at"] is None
+                for recipient in message["broadcasted"]
+            )
+        ]
 
     @staticmethod
     def __validate_string_condition(_str: str) -> tuple[bool, str | None, Optional[Callable], str, str]:
@@ -533,119 +706,84 @@ class MessageHandler:
         :return: list of indices, list of messages if retrieving (see more in get_messages), otherwise None
         """
 
-        # check if only allowed characters are present in the _query
-        allowed_characters = re.compile(r'^[A-Za-z,._\-<>=!(){}\s]+')
-
-        if not allowed_characters.match(_query).group() == _query:
-
-            # raise error if not allowed characters
-            raise ValueError("Not allowed characters detected in the query.")
-
-        if not (_query.count(',') == _query.count(', ') and _query.count(' ,') == 0):
-
-            # raise error if any ',' is written without space after or with space before it
-            raise ValueError("Semicolons must have space after and no space before itself.")
-
-        # replace 'AND' with semicolons
-        _query = _query.replace(' AND ', ', ')
-
-        # check if capitalized words are only the allowed_methods
-        allowed_methods = ["GET", "UPDATE", "DELETE", "WHERE", "ALL", "IN"]
-
-        for word in _query.split(' '):
-            if word.isupper() and word not in allowed_methods:
-                raise ValueError
+        action, update_items, where_items, foi = _compile_query(_query)
 
         # first rule out the most basic possibilities
-        if "GET ALL" in _query:
+        if action == "GET ALL":
 
             # return all messages
             return self.waiting_messages
 
-        elif "DELETE ALL" in _query:
+        elif action == "DELETE ALL":
 
             # remove all messages
             self.waiting_messages = []
 
-        else:
-            # Here we are left with 'GET WHERE ...', 'UPDATE ALL ...', 'UPDATE ... WHERE ...', 'DELETE WHERE ...',
-            # 'DELETE IN(...) WHERE ...'
+        elif action == "GET WHERE":
+            # use get_messages(...)
 
-            query_items = _query.split(' ')
+            # all args are conditions
+            _cond = self.__str_to_cond_dict(where_items, *where_val)
 
-            if "GET WHERE " in _query:
-                # use get_messages(...)
+            return self.get_messages(_cond)[1]
 
-                # all args are conditions
-                _cond = self.__str_to_cond_dict(query_items[2:], *where_val)
+        elif action == "UPDATE ALL":
+            # use update_messages(...)
 
-                return self.get_messages(_cond)[1]
+            # no conditions, all args are fields to be updated
+            self.__update_multiple(update_items, update_val)
 
-            elif "UPDATE ALL " in _query:
-                # use update_messages(...)
+        elif action == "UPDATE WHERE":
+            # use update_messages(...)
 
-                # no conditions, all args are fields to be updated
-                self.__update_multiple(query_items[2:], update_val)
+            _cond = self.__str_to_cond_dict(where_items, *where_val)
 
-            elif "UPDATE " in _query and " WHERE " in _query:
-                # use update_messages(...)
+            self.__update_multiple(update_items, update_val, _cond=_cond)
 
-                _cond = self.__str_to_cond_dict(query_items[query_items.index("WHERE") + 1:], *where_val)
+        elif action == "DELETE WHERE":
 
-                self.__update_multiple(query_items[1:query_items.index("WHERE")], update_val, _cond=_cond)
+            _cond = self.__str_to_cond_dict(where_items, *where_val)
 
-            elif "DELETE WHERE " in _query:
+            access_points, _ = self.get_messages(_cond)
 
-                _cond = self.__str_to_cond_dict(query_items[2:], *where_val)
+            if access_points:
 
-                access_points, _ = self.get_messages(_cond)
+                # extract only message indices and remove duplicates
+                message_indices = list(set(list(zip(*access_points))[0]))
 
-                if access_points:
+                for i in sorted(message_indices, reverse=True):
+                    del self.waiting_messages[i]
 
-                    # extract only message indices and remove duplicates
-                    message_indices = list(set(list(zip(*access_points))[0]))
-
-                    for i in sorted(message_indices, reverse=True):
-                        del self.waiting_messages[i]
+        elif action == "DELETE IN":
+            # removing an element from an embedded list of elements
 
-            elif "DELETE IN(" in _query and ") WHERE " in _query:
-                # removing an element from an embedded list of elements
+            _cond = self.__str_to_cond_dict(where_items, *where_val)
 
-                # foi - field of interest - extract whatever is within 'IN'
-                foi = query_items[1][3:-1]
-
-                _cond = self.__str_to_cond_dict(query_items[3:], *where_val)
-
-                access_points, _ = self.get_messages(_cond)
+            access_points, _ = self.get_messages(_cond)
 
-                if access_points:
+            if access_points:
 
-                    # E.g. DELETE IN(broadcasted) WHERE message_id=="..." will remove all stuff from broadcasted list
-                    # E.g. DELETE IN(broadcasted) WHERE timestamps.server_received==datetime(...) will also remove all
-                    # elements from the list
-                    # E.g. DELETE IN(broadcasted) WHERE message_id=="..." AND broadcasted.client_name="..." will remove
-                    # the matching element(s) from the broadcasted list
-                    if len(set([k.split('.')[0] for k in _cond.keys() if '.' in k])) == 1:
-                        # remove one element from the embedded list
+                # E.g. DELETE IN(broadcasted) WHERE message_id=="..." will remove all stuff from broadcasted list
+                # E.g. DELETE IN(broadcasted) WHERE timestamps.server_received==datetime(...) will also remove all
+                # elements from the list
+                # E.g. DELETE IN(broadcasted) WHERE message_id=="..." AND broadcasted.client_name="..." will remove
+                # the matching element(s) from the broadcasted list
+                if len(set([k.split('.')[0] for k in _cond.keys() if '.' in k])) == 1:
+                    # remove one element from the embedded list
 
-                        access_points.reverse()
+                    access_points.reverse()
 
-                        for i, j in access_points:
-                            del self.waiting_messages[i][foi][j]
+                    for i, j in access_points:
+                        del self.waiting_messages[i][foi][j]
 
-                    else:
-                        # clear whole list
-
-                        # extract only message indices and remove duplicates
-                        message_indices = list(set(list(zip(*access_points))[0]))
-
-                        for i in sorted(message_indices, reverse=True):
-                            self.waiting_messages[i][foi].clear()
+                else:
+                    # clear whole list
 
-            else:
+                    # extract only message indices and remove duplicates
+                    message_indices = list(set(list(zip(*access_points))[0]))
 
-                # some other exception with the query happened
-                raise Exception(f"Cannot find an action for given query {_query}")
+                    for i in sorted(message_indices, reverse=True):
+                        self.waiting_messages[i][foi].clear()
 
 
 class SortByDate:
@@ -706,11 +844,25 @@ class SortByDate:
         :param keys: key of the field ^ (or two keys if the field is embedded)
         :return: sorted list
         """
+        return sorted(_list, key=SortByDate.get_sort_key(*keys))
+
+    @staticmethod
+    def get_sort_key(*keys) -> Callable[[dict], Any]:
+        """
+        Get the function returning the value sort_by_date() sorts by, e.g. for keys = ["foo", "timestamp"]:
+            {"foo": {"timestamp": 2019-12-20}} -> 2019-12-20
+
+        :param keys: key of the field (or two keys if the field is embedded)
+        :return: key function to be used with sorted(), bisect.insort(), etc.
+        """
         # All elements of the keys list must be strings
-        if not all([isinstance(key, str) for key in keys]):
+        if not all(isinstance(key, str) for key in keys):
             raise TypeError(f"Input keys ({keys}) has incorrect type.")
 
-        return sorted(_list, key=lambda x: x[keys[0]] if len(keys) == 1 else x[keys[0]][keys[1]])
+        if len(keys) == 1:
+            return operator.itemgetter(keys[0])
+
+        return lambda x: x[keys[0]][keys[1]]
 
 
 if __name__ == "__main__":
@@ -2,13 +2,46 @@ from pydantic import BaseModel, validator, Extra, Field, root_validator
 from pydantic.utils import lenient_issubclass, lenient_isinstance
 from datetime import datetime
 from typing import Tuple, TypeVar, Any
-import pickle
+import socket
 from src.shared_enum_vars import ServerResponseTypes
 
 
 AddrType = TypeVar('AddrType', bound=Tuple[str, int])
 
 
+# first byte of a serialized address - 0xff never occurs in UTF-8, hence pydantic cannot decode the address into a str
+# when it validates UserStatus.client_name (str | bytes)
+_ADDR_PREFIX = b'\xff'
+
+
+def dump_addr(addr: tuple[str, int]) -> bytes:
+    """
+    Serialize client address, so that it can be stored as client_name in the UserStatus (see is_addr_type()) - the
+    _ADDR_PREFIX byte, 4 bytes of the ip address and 2 bytes of the port number (big-endian).
+    """
+    return _ADDR_PREFIX + socket.inet_aton(addr[0]) + addr[1].to_bytes(2, 'big')
+
+
+def load_addr(addr: bytes) -> tuple[str, int]:
+    """
+    Reverse of dump_addr().
+    """
+    if len(addr) != 7 or not addr.startswith(_ADDR_PREFIX):
+        raise ValueError(f"Serialized address has to be 7 bytes long and start with {_ADDR_PREFIX!r}, got {addr!r}.")
+
+    return socket.inet_ntoa(addr[1:5]), int.from_bytes(addr[5:], 'big')
+
+
+def encode_addr(addr: tuple[str, int]) -> str:
+    """
+    Render client address as digits only, e.g. ("127.0.0.1", 5050) -> "127000000001005050" (ip octets padded to 3
+    digits, port padded to 6). Used in message and client ids.
+    """
+    ip, port = addr
+    a, b, c, d = ip.split('.')
+    return "%03d%03d%03d%03d%06d" % (int(a), int(b), int(c), int(d), port)
+
+
 def is_ipv4(_str: str) -> bool:
     # does it contain commas?
     if '.' in _str:
@@ -45,7 +78,7 @@ def is_addr_type(var: Any) -> bool:
         try:
 
             # try to convert it to python object
-            addr = pickle.loads(var)
+            addr = load_addr(var)
 
         except Exception as err:
 
@@ -96,9 +129,8 @@ def get_message_id(message_id: str | None, values: dict) -> str:
         # combine timestamp with client IP address to form most likely unique ID. Assumption: client cannot send two
         # messages at the same time.
         timestamp_str = timestamp.strftime("%Y%m%d%H%M%S%f")
-        _ip_str = "".join(list(map(lambda x: x.zfill(3), addr[0].split('.'))))
 
-        return timestamp_str + _ip_str + str(addr[1]).zfill(6)
+        return timestamp_str + encode_addr(addr)
     else:
         return message_id
 
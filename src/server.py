@@ -1,6 +1,5 @@
 import codecs
 import os
-import pickle
 import socket
 from datetime import datetime
 from pathlib import Path
@@ -11,12 +10,18 @@ from secrets import token_hex
 from nacl.public import PrivateKey, SealedBox
 from src.shared_enum_vars import ClientResponseTypes, ServerResponseTypes, ServerEventTypes
 from src.message_handler import MessageHandler
-from src.schema import MessageSchema, ServerClientCommunicationSchema, AddrType
+from src.schema import MessageSchema, ServerClientCommunicationSchema, AddrType, dump_addr, load_addr, encode_addr
 import select
 from src.slice_string import slice_string
 from pydantic import BaseModel
 from threading import Thread
 from time import sleep, time
+from queue import SimpleQueue
+from operator import itemgetter
+from itertools import count
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
 project_path = Path(__file__).parent.parent.resolve()
@@ -29,13 +34,35 @@ MESSAGE_ID_HEADER_LENGTH = int(os.getenv('MESSAGE_ID_HEADER_LENGTH'))
 MESSAGE_LENGTH_HEADER_LENGTH = int(os.getenv('MESSAGE_LENGTH_HEADER_LENGTH'))
 TIMEOUT_SECONDS = int(os.getenv('TIMEOUT_SECONDS'))
 
+# "[EVENT_TYPE] " part of the log line, built once per event type instead of on every log() call
+_LOG_EVENT_TAGS: dict[ServerEventTypes, str] = {event: f" [{event.value}] " for event in ServerEventTypes}
+
+# size of a single log file and number of rotated files to keep
+_LOG_MAX_BYTES = 64 * 1024 * 1024
+_LOG_BACKUP_COUNT = 8
+
+# names the logger of each server: src.server.0, src.server.1, ...
+_server_ids = count()
+
+# messages of the busiest log events, filled with a single %-formatting call
+_MESSAGE_RECEIVED_TEMPLATE = "New message from %s %s: [%s, %s] %s (ID: %s)"
+_get_message_received_args = itemgetter(
+    'client_name', 'client_addr', 'client_response_type', 'message_sent_at', 'message_content', 'message_id'
+)
+_MESSAGE_DISPATCHED_TEMPLATE = "Client message ID: %s, server response: %s, server message id: %s"
+_get_message_dispatched_args = itemgetter('client_message_id', 'server_response_type', 'server_message_id')
+
+# kwargs of the DEBUG event: log(ServerEventTypes.DEBUG, ..., func_name="...", message="...")
+_get_debug_func_name_and_message = itemgetter('func_name', 'message')
+
 
 class Server:
     def __init__(
             self,
             __debug: bool = False,
-            __log_file_created_at: datetime = datetime.now(),
-            __use_addr: tuple[str, int] = (socket.gethostbyname(socket.gethostname()), 0)
+            __log_file_created_at: datetime | None = None,
+            __use_addr: tuple[str, int] = (socket.gethostbyname(socket.gethostname()), 0),
+            __log_dir: Path | None = None
     ):
         # Generate passcode for client verification
         self.passcode: str = token_hex(64)
@@ -57,8 +84,46 @@ class Server:
         self.debug = __debug
         self.methods_called_debug: list[str] = []
 
-        # filename for logging messages
-        self.log_filename = "log_" + __log_file_created_at.strftime("%Y%m%d%H%M%S%f") + ".txt"
+        # filename for logging messages - the creation time is taken when the server is created, not when this module
+        # is imported; otherwise all servers started in one process would write to the same file
+        if __log_file_created_at is None:
+            __log_file_created_at = datetime.now()
+
+        self.log_filename = f"log_{__log_file_created_at:%Y%m%d%H%M%S%f}.txt"
+
+        # directory the log files are saved in, log/ in the project directory by default
+        self.log_dir = project_path / 'log' if __log_dir is None else Path(__log_dir)
+
+        # log() hands lines over to this server's QueueHandler and the QueueListener thread writes them to
+        # <log_dir>/<log_filename>, so that handling messages does not wait for the disk. In debug mode lines are printed
+        # instead, hence neither the log file nor the listener is created. close() stops the listener - it is called at
+        # the latest when the interpreter exits, so that the lines still in the queue are written out.
+        self._log_listener: QueueListener | None = None
+
+        if not self.debug:
+            os.makedirs(self.log_dir, exist_ok=True)
+
+            # a logger of the server's own, not registered with logging.getLogger() - records of other loggers never
+            # reach it and it is not kept alive by the logging module after the server is closed
+            self._logger = logging.Logger(f"{__name__}.{next(_server_ids)}", logging.INFO)
+
+            log_queue: SimpleQueue = SimpleQueue()
+
+            self._log_queue_handler = QueueHandler(log_queue)
+            self._logger.addHandler(self._log_queue_handler)
+
+            self._log_file_handler = RotatingFileHandler(
+                self.log_dir / self.log_filename,
+                maxBytes=_LOG_MAX_BYTES,
+                backupCount=_LOG_BACKUP_COUNT,
+                delay=True
+            )
+            self._log_file_handler.setFormatter(logging.Formatter('%(message)s'))
+
+            self._log_listener = QueueListener(log_queue, self._log_file_handler)
+            self._log_listener.start()
+
+            atexit.register(self.close)
 
         # Create a socket
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -72,14 +137,45 @@ class Server:
 
         # list of all approved connections
         self.sockets_list = [self.server_socket]
-        # [{"client_name": "...", "addr": (..., ...)}] - approved clients that sent their username
-        self.clients_list: list[Mapping[str, str | AddrType]] = []
+        # {(ip, port): client_socket} - sockets of the approved connections, looked up by the dispatcher
+        self.sockets_by_addr: dict[AddrType, socket.socket] = {}
+        # {(ip, port): "client_name"} - approved clients that sent their username, in the order they joined
+        self.clients_by_addr: dict[AddrType, str] = {}
+        # {"client_name": (ip, port)} - the same clients looked up by name
+        self.addr_by_client_name: dict[str, AddrType] = {}
 
         # This makes server listen to new connections
         self.server_socket.listen()
 
         print(f"[SERVER] Listening at {self.addr}")
 
+    @property
+    def clients_list(self) -> list[Mapping[str, str | AddrType]]:
+        """
+        Approved clients as [{"client_name": "...", "addr": (..., ...)}] - built from clients_by_addr on every access,
+        so it is a copy; assign to it (or to clients_by_addr) to change the clients.
+        """
+        return [{"client_name": client_name, "addr": addr} for addr, client_name in self.clients_by_addr.items()]
+
+    @clients_list.setter
+    def clients_list(self, clients: list[Mapping[str, str | AddrType]]) -> None:
+        self.clients_by_addr = {c["addr"]: c["client_name"] for c in clients}
+        self.addr_by_client_name = {c["client_name"]: c["addr"] for c in clients}
+
+    def close(self) -> None:
+        """
+        Stop the log listener - it writes out whatever is left in its queue first - close the log file and the server
+        socket. Calling it again does nothing.
+        """
+        if self._log_listener is not None:
+            atexit.unregister(self.close)
+            self._logger.removeHandler(self._log_queue_handler)
+            self._log_listener.stop()
+            self._log_listener = None
+            self._log_file_handler.close()
+
+        self.server_socket.close()
+
     def get_passcode(self) -> str:
         """
         Return generated passcode to the console - user then can copy it and give it to whomever he wants to message
@@ -103,8 +199,7 @@ class Server:
             self.methods_called_debug.append("__get_client_id")
 
         # id=<ip_as_str><port_padded_with_zeros>
-        ip_str = "".join(list(map(lambda x: x.zfill(3), client_socket.getpeername()[0].split('.'))))
-        return ip_str + str(client_socket.getpeername()[1]).zfill(6)
+        return encode_addr(client_socket.getpeername())
 
     def handle_clients(
             self,
@@ -137,13 +232,14 @@ class Server:
 
                 # Passcode correct add to sockets_list
                 self.sockets_list.append(client_socket)
+                self.sockets_by_addr[client_socket.getpeername()] = client_socket
 
                 print(f"[SERVER - HC] sockets_list: {self.sockets_list}")
 
                 # Add PASSCODE_CORRECT response to server messages
                 self.server_messages.append_message(
                     response_type=ServerResponseTypes.PASSCODE_CORRECT,
-                    broadcasted=[{"client_name": pickle.dumps(client_socket.getpeername())}],
+                    broadcasted=[{"client_name": dump_addr(client_socket.getpeername())}],
                     server_addr=self.server_socket.getsockname()
                 )
 
@@ -156,7 +252,7 @@ class Server:
                 # Passcode incorrect add PASSCODE_INCORRECT to server messages
                 self.server_messages.append_message(
                     response_type=ServerResponseTypes.PASSCODE_INCORRECT,
-                    broadcasted=[{"client_name": pickle.dumps(client_socket.getpeername())}],
+                    broadcasted=[{"client_name": dump_addr(client_socket.getpeername())}],
                     server_addr=self.server_socket.getsockname()
                 )
 
@@ -167,25 +263,23 @@ class Server:
             print(f"[SERVER - HC] Client sent username: {client_message}")
 
             # Check if the username already exists
-            for c in self.clients_list:
-
-                if client_message == c["client_name"]:
+            if client_message in self.clients_by_addr.values():
 
-                    # Respond to the client
-                    self.server_messages.append_message(
-                        response_type=ServerResponseTypes.USERNAME_ALREADY_EXISTS,
-                        broadcasted=[{"client_name": pickle.dumps(client_socket.getpeername())}],
-                        server_addr=self.server_socket.getsockname()
-                    )
-
-                    break
+                # Respond to the client
+                self.server_messages.append_message(
+                    response_type=ServerResponseTypes.USERNAME_ALREADY_EXISTS,
+                    broadcasted=[{"client_name": dump_addr(client_socket.getpeername())}],
+                    server_addr=self.server_socket.getsockname()
+                )
 
             else:
 
-                # Add client to clients_list
-                self.clients_list.append({"client_name": client_message, "addr": client_socket.getpeername()})
+                # Add client to clients_by_addr
+                client_addr = client_socket.getpeername()
+                self.clients_by_addr[client_addr] = client_message
+                self.addr_by_client_name[client_message] = client_addr
 
-                print(f"[SERVER - HC] clients_list: {self.clients_list}")
+                print(f"[SERVER - HC] clients_by_addr: {self.clients_by_addr}")
 
                 # Respond to the client
                 self.server_messages.append_message(
@@ -194,11 +288,14 @@ class Server:
                     server_addr=self.server_socket.getsockname()
                 )
 
-                if len(self.clients_list) > 1:
+                if len(self.clients_by_addr) > 1:
 
                     self.server_messages.append_message(
                         response_type=ServerResponseTypes.CLIENT_CONNECTED,
-                        broadcasted=[{"client_name": c["client_name"]} for c in self.clients_list[:-1]],
+                        broadcasted=[
+                            {"client_name": client_name} for client_name in self.clients_by_addr.values()
+                            if client_name != client_message
+                        ],
                         server_addr=self.server_socket.getsockname(),
                         info=self.__get_client_id(client_socket) + client_message
                     )
@@ -210,26 +307,23 @@ class Server:
 
             print("[SERVER - HC] Client disconnected")
 
+            client_addr = client_socket.getpeername()
+
             if client_socket in self.sockets_list:
 
                 self.sockets_list.remove(client_socket)
+                self.sockets_by_addr.pop(client_addr, None)
 
-            if client_socket.getpeername() in [c["addr"] for c in self.clients_list]:
+            client_name = self.clients_by_addr.pop(client_addr, None)
 
-                self.clients_list.remove(
-                    next(
-                        (
-                            user for user in self.clients_list
-                            if user["addr"] == client_socket.getpeername()
-                        ),
-                        None
-                    )
-                )
+            if client_name is not None:
+
+                self.addr_by_client_name.pop(client_name, None)
 
                 # Inform other clients that client's disconnected
                 self.server_messages.append_message(
                     response_type=ServerResponseTypes.CLIENT_DISCONNECTED,
-                    broadcasted=[{"client_name": c["client_name"]} for c in self.clients_list],
+                    broadcasted=[{"client_name": name} for name in self.clients_by_addr.values()],
                     server_addr=self.server_socket.getsockname(),
                     info=self.__get_client_id(client_socket)
                 )
@@ -423,13 +517,7 @@ class Server:
                 print(f"[SERVER - HIM] client_socket.getpeername(): {client_socket.getpeername()}")
 
                 # Find user with given address, if none is found client was probably not approved to send messages
-                username = next(
-                    (
-                        user["client_name"] for user in self.clients_list
-                        if user["addr"] == client_socket.getpeername()
-                    ),
-                    None
-                )
+                username = self.clients_by_addr.get(client_socket.getpeername())
 
                 if response_type in [
                         ClientResponseTypes.USERNAME_GIVEN.value,
@@ -461,7 +549,7 @@ class Server:
                         print(f"[SERVER - HIM] Saving: header: {message_length}, client_name: {username}, "
                               f"timestamps.client_sent: {client_sent_at}, timestamps.server_received: "
                               f"{server_received_at}, message: {message}, client_address: {client_socket.getpeername()}"
-                              f", broadcasted.client_name: {[user['client_name'] for user in self.clients_list if user['client_name'] != username]}")
+                              f", broadcasted.client_name: {[name for name in self.clients_by_addr.values() if name != username]}")
 
                         self.client_messages.append_message(
                             message_id=None,
@@ -473,7 +561,7 @@ class Server:
                             },
                             message=message,
                             client_address=client_socket.getpeername(),
-                            broadcasted=[{"client_name": user["client_name"]} for user in self.clients_list if user["client_name"] != username]
+                            broadcasted=[{"client_name": name} for name in self.clients_by_addr.values() if name != username]
                         )
 
                         print(f"[SERVER - HIM] self.client_messages.waiting_messages: {self.client_messages.waiting_messages}")
@@ -523,7 +611,7 @@ class Server:
 
             print(f"[SERVER - MD] Found message(s) to be send.")
             print(f"[SERVER - MD] msg['broadcasted'] = {msg['broadcasted']}")
-            print(f"[SERVER - MD] self.clients_list = {self.clients_list}")
+            print(f"[SERVER - MD] self.clients_by_addr = {self.clients_by_addr}")
 
             # Iterate over all clients
             for client in msg["broadcasted"]:
@@ -531,30 +619,24 @@ class Server:
                 print(f"[SERVER - MD] client_name = {client['client_name']}")
                 print(f"[SERVER - MD] type(client_name) = {type(client['client_name'])}")
 
-                # Check if the client_name is bytes, i.e. is it client registered in the clients_list
+                # Check if the client_name is bytes, i.e. is it client registered in the clients_by_addr
                 if isinstance(client["client_name"], bytes):
 
                     # Convert to tuple
-                    addr = pickle.loads(client["client_name"])
+                    addr = load_addr(client["client_name"])
 
                     print(f"[SERVER - MD] addr = {addr}")
 
                     # Grab the client socket by the address
-                    recipient_client_socket = next((soc for soc in self.sockets_list[1:] if soc.getpeername() == addr), None)
+                    recipient_client_socket = self.sockets_by_addr.get(addr)
 
                 else:
 
-                    # Grab username and addr if the client is still connected, else None
-                    client_data = next((c for c in self.clients_list if c["client_name"] == client["client_name"]), None)
+                    # Grab addr if the client is still connected, else None
+                    client_addr = self.addr_by_client_name.get(client["client_name"])
 
-                    if client_data:
-
-                        # Grab the client socket by the address
-                        recipient_client_socket = next((soc for soc in self.sockets_list[1:] if soc.getpeername() == client_data["addr"]), None)
-
-                    else:
-
-                        recipient_client_socket = None
+                    # Grab the client socket by the address
+                    recipient_client_socket = self.sockets_by_addr.get(client_addr) if client_addr else None
 
                 print(f"[SERVER - MD] recipient_client_socket = {recipient_client_socket}")
 
@@ -648,14 +730,12 @@ class Server:
         if self.debug:
             self.methods_called_debug.append("log")
 
-        line_beginning = f"{timestamp} [{server_event_type.value()}] "
-
         match server_event_type:
             case ServerEventTypes.STARTING:
                 message = f"Server is booting up..."
 
             case ServerEventTypes.STARTED:
-                message = f"Run-time variables and their values: {(key + '=' + str(val) + ', ' for key, val in kwargs.items())}"
+                message = f"Run-time variables and their values: {', '.join(f'{key}={val}' for key, val in kwargs.items())}"
 
             case ServerEventTypes.LISTENING:
                 message = f"Server is listening on {self.addr}"
@@ -699,17 +779,14 @@ class Server:
 
             case ServerEventTypes.MESSAGE_RECEIVED:
                 try:
-                    message = f"New message from {kwargs['client_name']} {kwargs['client_addr']}: " \
-                              f"[{kwargs['client_response_type']}, {kwargs['message_sent_at']}] " \
-                              f"{kwargs['message_content']} (ID: {kwargs['message_id']})"
+                    message = _MESSAGE_RECEIVED_TEMPLATE % _get_message_received_args(kwargs)
                 except KeyError:
                     raise KeyError("'client_name', 'client_addr', 'client_response_type', 'message_sent_at', "
                                    "'message_content', 'message_id' key arguments required.")
 
             case ServerEventTypes.MESSAGE_DISPATCHED:
                 try:
-                    message = f"Client message ID: {kwargs['client_message_id']}, server response: " \
-                              f"{kwargs['server_response_type']}, server message id: {kwargs['server_message_id']}"
+                    message = _MESSAGE_DISPATCHED_TEMPLATE % _get_message_dispatched_args(kwargs)
                 except KeyError:
                     raise KeyError("'client_message_id', 'server_response_type', 'server_message_id' key arguments "
                                    "required.")
@@ -722,39 +799,28 @@ class Server:
 
             case ServerEventTypes.DEBUG:
                 try:
-                    if 'message' in kwargs.keys():
-                        message = f"({kwargs['func_name']}) {kwargs['message']}"
+                    if 'message' in kwargs:
+                        func_name, debug_message = _get_debug_func_name_and_message(kwargs)
+                        message = f"({func_name}) {debug_message}"
                     else:
-                        message = f"({kwargs['func_name']}) {(key + '=' + str(val) for key, val in kwargs.items() if key != 'func_name')}"
+                        message = f"({kwargs['func_name']}) " \
+                                  f"{', '.join(f'{key}={val}' for key, val in kwargs.items() if key != 'func_name')}"
                 except KeyError:
                     raise KeyError("'func_name' key argument required.")
 
             case _:
                 raise ValueError('Unrecognised value of server_event_type.')
 
+        line_beginning = f"{timestamp}{_LOG_EVENT_TAGS[server_event_type]}"
+
         if self.debug:
 
             print(line_beginning + message)
 
         else:
 
-            # check if the 'log' directory exists
-            if not os.path.exists(project_path / 'log'):
-
-                # create a log dir
-                os.mkdir(project_path / 'log')
-
-            # check if the file exists in the log directory
-            if not os.path.exists(project_path / f"log/{self.log_filename}"):
-
-                # it does not, create a new one
-                with open(project_path / self.log_filename, 'x') as _:
-                    pass
-
-            # write (append) the line to the log file
-            with open(project_path / self.log_filename, 'a') as f:
-
-                f.write(line_beginning + message)
+            # hand the line over to the listener thread
+            self._logger.info(line_beginning + message)
 
 
 if __name__ == "__main__":
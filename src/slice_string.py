@@ -1,4 +1,8 @@
 import re
+from itertools import accumulate
+
+# a slice that can be converted to float (see support_mixed_dtype in slice_string())
+_FLOAT_SLICE = re.compile(r'^-?\d+(?:\.\d+)$')
 
 
 def slice_string(
@@ -39,32 +43,31 @@ def slice_string(
         if not support_mixed_dtype:
             if _str.isdigit():
                 _type = int
-            elif all(list(map(lambda s: s.isdigit(), _str.split('.')))):
+            # digits separated by single dots, e.g. "2.346.2" - same as checking every '.'-separated part is a digit
+            # string, but done in a single pass over the string
+            elif _str.replace('.', '').isdigit() and '..' not in _str and not _str.startswith('.') \
+                    and not _str.endswith('.'):
                 _type = float
 
-    slices = []
-
-    # current_index will keep track of the progress through the string
-    current_index = start_at
+    # (start index, length) of each slice
+    bounds = zip(accumulate(slice_lengths, initial=start_at), slice_lengths)
 
-    # iterate through the slice_lengths list and slice the given string
-    for slice_len in slice_lengths:
-        # extract a slice of the string
-        _slice = _str[current_index:current_index + slice_len]
+    # every slice converted to the predefined type, e.g. all-digit string (timestamp "20221226200114323957") - each
+    # slice is an int
+    if not support_mixed_dtype:
+        return [_type(_str[i:i + slice_len]) for i, slice_len in bounds]
 
-        # update current_index
-        current_index += slice_len
-
-        # convert slice to the predefined type
-        converted = _type(_slice)
+    slices = []
 
-        # convert the slice to float or int if possible and if support_mixed_dtype=True
-        if support_mixed_dtype:
-            if _slice.isdigit():
-                converted = int(_slice)
-            elif re.match(r'^-?\d+(?:\.\d+)$', _slice):
-                converted = float(_slice)
+    # convert each slice to int or float if possible, leave it as str otherwise
+    for i, slice_len in bounds:
+        _slice = _str[i:i + slice_len]
 
-        slices.append(converted)
+        if _slice.isdigit():
+            slices.append(int(_slice))
+        elif _FLOAT_SLICE.match(_slice):
+            slices.append(float(_slice))
+        else:
+            slices.append(_slice)
 
     return slices
\ No newline at end of file
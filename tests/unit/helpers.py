@@ -0,0 +1,3 @@
+def approved_client(client_name: str, client_addr: tuple[str, int]) -> dict:
+    """Entry of Server.clients_list."""
+    return {"client_name": client_name, "addr": client_addr}
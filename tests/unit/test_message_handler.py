@@ -1,21 +1,70 @@
+import bisect
+import copy
 import json
 import operator
-import pickle
-import random
 import unittest
 from datetime import datetime
 from src.message_handler import MessageHandler
-import socket
-import threading
 from typing import Optional, Union, Tuple
-from dotenv import load_dotenv
-from pathlib import Path
-import os
 from pydantic import BaseModel, Extra, validator, ValidationError
 from enum import Enum
 from src.schema import MessageSchema
 from collections import OrderedDict
 
+# length of the encoded "Hello world!" example message
+_HELLO_LEN = len(b"Hello world!")
+
+# example message
+_MESSAGE_TEMPLATE = {
+    "header": _HELLO_LEN,
+    "message_id": "20221101222010000294127000000001",
+    "client_name": "John",
+    "timestamps": {
+        "client_sent": datetime(2022, 11, 1, 22, 20, 10, 294),
+        "server_received": datetime(2022, 11, 1, 22, 20, 11, 1261),
+    },
+    "message": "Hello world!",
+    "client_address": ("127.0.0.1", 5050),
+    "broadcasted": [
+        {
+            "client_name": "Mike",
+            "message_sent_at": None,
+            "message_received_at": None
+        }
+    ]
+}
+
+# list of example messages with some modifications for each one
+_CLIENT_LIST = ["John", "Mike"]
+
+# client_sent and server_received timestamps of the example messages
+_TS_CACHE = [datetime(2022, 11, 1, 22, 20, i, 294) for i in range(10)]
+_TS_RECV_CACHE = [datetime(2022, 11, 1, 22, 20, i + 1, 1261) for i in range(10)]
+
+_MESSAGE_LIST_TEMPLATE = [
+    {
+        "header": _HELLO_LEN,
+        "message_id": f"202211012220{str(i).zfill(2)}000029412700000000{i % 2}",
+        "client_name": _CLIENT_LIST[i % 2],
+        "timestamps": {
+            "client_sent": _TS_CACHE[i],
+            "server_received": _TS_RECV_CACHE[i],
+        },
+        "message": "Hello world!",
+        "client_address": (f"127.0.0.{i % 2}", 5050),
+        "broadcasted": [
+            {
+                "client_name": _CLIENT_LIST[i % 2],
+                "message_sent_at": None,
+                "message_received_at": None
+            }
+        ]
+    } for i in range(10)
+]
+
+# fields of MessageSchema, serialized once instead of in the test body
+_MESSAGE_SCHEMA_KEYS = tuple(json.loads(MessageSchema.schema_json())["properties"].keys())
+
 
 class SampleSubSchema(BaseModel):
     field_a: str
@@ -52,79 +101,46 @@ class SampleSchema(BaseModel):
             raise ValidationError("Oops! Something went wrong.")
 
 
-class TestMessageHandler(unittest.TestCase):
-    def setUp(self) -> None:
-        # use local address for the connection
-        self.ADDR = (socket.gethostbyname(socket.gethostname()), 5050)
+# optional fields of SampleSchema left at their default
+_OPTIONAL_NONES = dict.fromkeys(("field3", "field4", "field5", "field6", "field7", "field8", "field9"))
+
+
+def _message_ids(messages: list[dict]) -> list[str]:
+    """Message IDs in the order they were returned - enough to compare results of queries that only select messages."""
+    return [msg["message_id"] for msg in messages]
 
+
+class TestMessageHandler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
         # the SampleSchema is used for some tests of append_message function
-        self.sender = MessageHandler(SampleSchema)
+        cls._sender_template = MessageHandler(SampleSchema)
 
         # other functions' tests (+ extra append_message() test) will use MessageSchema from schema.py
-        self.sender2 = MessageHandler(MessageSchema)
-        # example message
-        self.message = {
-            "header": len(bytes("Hello world!", encoding='utf-8')),
-            "message_id": "20221101222010000294127000000001",
-            "client_name": "John",
-            "timestamps": {
-                "client_sent": datetime(2022, 11, 1, 22, 20, 10, 294),
-                "server_received": datetime(2022, 11, 1, 22, 20, 11, 1261),
-            },
-            "message": "Hello world!",
-            "client_address": ("127.0.0.1", 5050),
-            "broadcasted": [
-                {
-                    "client_name": "Mike",
-                    "message_sent_at": None,
-                    "message_received_at": None
-                }
-            ]
-        }
+        cls._sender2_template = MessageHandler(MessageSchema)
 
-        # list of example messages with some modifications for each one
-        self.client_list = ["John", "Mike"]
-
-        self.message_list = [
-            {
-                "header": len(bytes("Hello world!", encoding='utf-8')),
-                "message_id": f"202211012220{str(i).zfill(2)}000029412700000000{i % 2}",
-                "client_name": self.client_list[i % 2],
-                "timestamps": {
-                    "client_sent": datetime(2022, 11, 1, 22, 20, i, 294),
-                    "server_received": datetime(2022, 11, 1, 22, 20, i + 1, 1261),
-                },
-                "message": "Hello world!",
-                "client_address": (f"127.0.0.{i % 2}", 5050),
-                "broadcasted": [
-                    {
-                        "client_name": self.client_list[i % 2],
-                        "message_sent_at": None,
-                        "message_received_at": None
-                    }
-                ]
-            } for i in range(10)
-        ]
-        self.sender2.waiting_messages = self.message_list
+    def setUp(self) -> None:
+        # handlers are built once per class, each test gets a shallow copy with a fresh state
+        self.sender = self._fresh_handler(self._sender_template)
+        self.sender2 = self._fresh_handler(self._sender2_template)
 
-        # Set up a server
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind(self.ADDR)
-        self.server.listen()
+        # example message
+        self.message = copy.deepcopy(_MESSAGE_TEMPLATE)
 
-        # set up a client
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client.connect(self.ADDR)
+        self.client_list = _CLIENT_LIST
 
-        # load environmental variables
-        dotenv_path = Path(__file__).parent.parent.resolve() / ".env"
-        load_dotenv(dotenv_path=dotenv_path)
-        self.FORMAT = os.getenv('FORMAT')
-        self.MESSAGE_LENGTH_HEADER_LENGTH = int(os.getenv('MESSAGE_LENGTH_HEADER_LENGTH'))
+        # tests modify the messages, hence each of them works on its own copy
+        self.message_list = copy.deepcopy(_MESSAGE_LIST_TEMPLATE)
+        self.sender2.waiting_messages = self.message_list
 
-    def tearDown(self) -> None:
-        self.server.close()
-        self.client.close()
+    @staticmethod
+    def _fresh_handler(template: MessageHandler) -> MessageHandler:
+        """Shallow copy of the template handler with the per-test state reset."""
+        handler = copy.copy(template)
+        handler.waiting_messages = []
+        handler.sort_messages_by_date = False
+        handler.timestamp_key = None
+        return handler
 
     def test_append_message_all_fields_str_where_union(self) -> None:
         msg = {
@@ -176,9 +192,7 @@ class TestMessageHandler(unittest.TestCase):
         }
         self.sender.append_message(**msg)
 
-        expected = [
-            dict(msg, **{key: None for key in ["field3", "field4", "field5", "field6", "field7", "field8", "field9"]})
-        ]
+        expected = [{**msg, **_OPTIONAL_NONES}]
         actual = self.sender.waiting_messages
         self.assertEqual(expected, actual)
 
@@ -278,51 +292,17 @@ class TestMessageHandler(unittest.TestCase):
         actual = self.sender.waiting_messages
         self.assertEqual([], actual)
 
-    @unittest.skip("message_handler.py no longer hosts message_dispatcher, test left as a reference.")
-    def test_message_dispatcher(self) -> None:
-        expected = {
+    def test_append_message_no_validation(self) -> None:
+        msg = {
             "field1": "foo",
-            "field2": 713
+            "field2": "not an int"
         }
-        self.sender.waiting_messages.append(expected)
-
-        conn, _ = self.server.accept()  # wait to accept any incoming messages
-
-        print(type(self.client))
-
-        # handle sending the message in a separate thread
-        client_thread = threading.Thread(target=self.sender.message_dispatcher, args=[self.client])
-        client_thread.start()
-
-        print("started threading")
-
-        msg_length = int(conn.recv(self.MESSAGE_LENGTH_HEADER_LENGTH).decode(self.FORMAT))
-
-        print(msg_length)
-
-        actual = pickle.loads(conn.recv(msg_length))
-
-        conn.send(str(True).encode(self.FORMAT))
-
-        print(actual)
-
-        conn.close()
+        self.sender.append_message(_validate=False, **msg)
 
+        expected = [{**msg, **_OPTIONAL_NONES}]
+        actual = self.sender.waiting_messages
         self.assertEqual(expected, actual)
 
-    @unittest.skip("message_handler.py no longer hosts message_dispatcher, test left as a reference.")
-    def test_message_dispatcher_pop_message(self) -> None:
-        self.sender.waiting_messages.append({"msg": "Hello World!", "client_name": 'John'})
-
-        conn, _ = self.server.accept()  # wait to accept any incoming messages
-
-        # handle sending the message in a separate thread
-        client_thread = threading.Thread(target=self.sender.message_dispatcher, args=[conn])
-        client_thread.start()
-
-        if not client_thread.is_alive():
-            self.assertEqual([], self.sender.waiting_messages)
-
     def test_append_message_message_schema(self) -> None:
         self.sender2.waiting_messages = []
         self.sender2.append_message(**self.message)
@@ -347,14 +327,35 @@ class TestMessageHandler(unittest.TestCase):
         self.sender2.waiting_messages = []
         self.sender2.sort_messages_by_date = True
 
-        input_list = random.sample(self.message_list, len(self.message_list))
-        for msg in input_list:
+        input_list = list(reversed(self.message_list))
+        self.sender2.append_messages(input_list)
+
+        actual = [msg["timestamps"]["client_sent"] for msg in self.sender2.waiting_messages]
+
+        self.assertEqual(expected, actual)
+
+    def test_append_message_sorting_by_date_one_by_one(self) -> None:
+        expected = [msg["timestamps"]["client_sent"] for msg in self.message_list]
+
+        self.sender2.waiting_messages = []
+        self.sender2.sort_messages_by_date = True
+
+        for msg in reversed(self.message_list):
             self.sender2.append_message(**msg)
 
         actual = [msg["timestamps"]["client_sent"] for msg in self.sender2.waiting_messages]
 
         self.assertEqual(expected, actual)
 
+    def test_append_messages_one_invalid(self) -> None:
+        self.sender2.waiting_messages = []
+        input_list = self.message_list + [{"client_name": "John"}]
+
+        with self.assertRaises(ValidationError):
+            self.sender2.append_messages(input_list)
+
+        self.assertEqual([], self.sender2.waiting_messages)
+
     def test_append_message_message_schema_no_id(self) -> None:
         self.sender2.waiting_messages = []
         self.sender2.sort_messages_by_date = True
@@ -408,8 +409,8 @@ class TestMessageHandler(unittest.TestCase):
     def test_get_schema_get_only_wrong_input(self) -> None:
         self.sender2.waiting_messages = []
 
-        key_list = json.loads(MessageSchema.schema_json())["properties"].keys()
-        expected_err_msg = f"Schema is not compatible with the request. Could not find field wrong_input in {key_list}."
+        expected_err_msg = f"Schema is not compatible with the request. Could not find field wrong_input in " \
+                           f"{_MESSAGE_SCHEMA_KEYS}."
         with self.assertRaises(KeyError) as context:
             self.sender2.get_schema(get_only="wrong_input")
             self.assertTrue(expected_err_msg in str(context.exception))
@@ -456,6 +457,24 @@ class TestMessageHandler(unittest.TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_get_not_broadcasted_messages_multiple_recipients(self) -> None:
+        # sent to neither of the recipients - not sent to John
+        self.message_list[0]["broadcasted"] = [
+            {"client_name": "John", "message_sent_at": None, "message_received_at": None},
+            {"client_name": "David", "message_sent_at": None, "message_received_at": None}
+        ]
+        # sent to John, not to David - nothing left to send to John
+        self.message_list[2]["broadcasted"] = [
+            {"client_name": "John", "message_sent_at": _TS_CACHE[2], "message_received_at": None},
+            {"client_name": "David", "message_sent_at": None, "message_received_at": None}
+        ]
+        self.sender2.waiting_messages = self.message_list[:4]
+
+        expected = [self.message_list[0]]
+        actual = self.sender2.get_not_broadcasted_messages(recipient_name="John")
+
+        self.assertEqual(expected, actual)
+
     def test_get_messages_no_messages(self) -> None:
         self.sender2.waiting_messages = []
 
@@ -488,7 +507,7 @@ class TestMessageHandler(unittest.TestCase):
             at="broadcasted",
             client_name=self.message_list[2]["broadcasted"][0]["client_name"]
         )
-        self.assertEqual(expected, actual)
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
 
     def test_get_messages_err_condition_key_name(self) -> None:
         self.assertRaises(KeyError, self.sender2.get_messages, foo="bar")
@@ -576,7 +595,7 @@ class TestMessageHandler(unittest.TestCase):
             where_val=[self.message_list[2]["broadcasted"][0]["client_name"]]
         )
 
-        self.assertEqual(expected, actual)
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
 
     def test_query_get_messages_err_condition_key_name(self) -> None:
         self.assertRaises(KeyError, self.sender2.query, _query="GET WHERE foo=={}", where_val=["bar"])
@@ -624,6 +643,33 @@ class TestMessageHandler(unittest.TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_query_get_messages_by_date_range_sorted(self) -> None:
+        self.sender2.waiting_messages = []
+        self.sender2.sort_messages_by_date = True
+        self.sender2.append_messages(self.message_list)
+
+        # messages are sorted by client_sent, so the expected ones are a slice of the list
+        expected = self.message_list[bisect.bisect_right(_TS_CACHE, datetime(2022, 11, 1, 22, 20, 6)):]
+
+        actual = self.sender2.query("GET WHERE timestamps.client_sent>{}", where_val=[datetime(2022, 11, 1, 22, 20, 6)])
+
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
+
+    def test_query_get_messages_by_date_range_assigned_unsorted(self) -> None:
+        self.sender2.sort_messages_by_date = True
+        self.sender2.timestamp_key = ["timestamps", "client_sent"]
+
+        # list assigned directly (not through append_messages()) in reverse order
+        self.sender2.waiting_messages = list(reversed(self.message_list))
+
+        expected = [msg for msg in self.message_list
+                    if msg["timestamps"]["client_sent"] >= datetime(2022, 11, 1, 22, 20, 5)]
+
+        actual = self.sender2.query("GET WHERE timestamps.client_sent>={}", where_val=[datetime(2022, 11, 1, 22, 20, 5)])
+
+        self.assertEqual(5, len(actual))
+        self.assertEqual(expected, actual)
+
     def test_query_get_messages_by_two_embedded_fields(self) -> None:
 
         expected = [msg for msg in self.sender2.waiting_messages if
@@ -632,7 +678,7 @@ class TestMessageHandler(unittest.TestCase):
 
         actual = self.sender2.query("GET WHERE timestamps.client_sent>={}, broadcasted.client_name=={}", where_val=[datetime(2022, 11, 1, 22, 20, 3), "John"])
 
-        self.assertEqual(expected, actual)
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
 
     def test_query_get_messages_by_client_address_and_embedded_field(self) -> None:
 
@@ -642,7 +688,7 @@ class TestMessageHandler(unittest.TestCase):
 
         actual = self.sender2.query("GET WHERE client_address=={}, timestamps.client_sent>={}", where_val=[(f"127.0.0.1", 5050), datetime(2022, 11, 1, 22, 20, 4)])
 
-        self.assertEqual(expected, actual)
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
 
     def test_query_get_messages_explicit_and(self) -> None:
 
@@ -652,7 +698,7 @@ class TestMessageHandler(unittest.TestCase):
 
         actual = self.sender2.query("GET WHERE client_address=={} AND timestamps.client_sent>={}", where_val=[(f"127.0.0.1", 5050), datetime(2022, 11, 1, 22, 20, 4)])
 
-        self.assertEqual(expected, actual)
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
 
     @unittest.skip("OR operator currently not supported")
     def test_query_get_messages_explicit_or(self) -> None:
@@ -662,7 +708,7 @@ class TestMessageHandler(unittest.TestCase):
 
         actual = self.sender2.query("GET WHERE client_address=={} OR timestamps.client_sent>={}", where_val=[(f"127.0.0.1", 5050), datetime(2022, 11, 1, 22, 20, 4)])
 
-        self.assertEqual(expected, actual)
+        self.assertEqual(_message_ids(expected), _message_ids(actual))
 
     def test_query_delete_where_message_id(self) -> None:
         expected = self.sender2.waiting_messages[1:]
@@ -0,0 +1,32 @@
+import unittest
+from src.schema import UserStatus, dump_addr, load_addr, is_addr_type
+
+
+class TestSchemaAddr(unittest.TestCase):
+    # well-known ports and the ephemeral ones the kernel hands out to the clients (net.ipv4.ip_local_port_range)
+    PORTS = [0, 80, 4660, 5050, 65535, *range(32768, 61000)]
+
+    def test_dump_addr_load_addr_round_trip(self) -> None:
+        for ip in ("127.0.0.1", "10.0.0.2", "192.168.1.255"):
+            with self.subTest(ip=ip):
+                actual = [load_addr(dump_addr((ip, port))) for port in self.PORTS]
+                self.assertEqual([(ip, port) for port in self.PORTS], actual)
+
+    def test_user_status_keeps_dumped_addr_as_bytes(self) -> None:
+        # dumped address must never be valid UTF-8 - pydantic would turn it into a str client_name otherwise
+        coerced = [
+            port for port in self.PORTS
+            if UserStatus(client_name=dump_addr(("127.0.0.1", port))).client_name != dump_addr(("127.0.0.1", port))
+        ]
+
+        self.assertEqual([], coerced)
+
+    def test_load_addr_wrong_input(self) -> None:
+        for addr in (b"", b"\x7f\x00\x00\x01\x13\xba", dump_addr(("127.0.0.1", 5050)) + b"\x00"):
+            with self.subTest(addr=addr):
+                self.assertRaises(ValueError, load_addr, addr)
+                self.assertFalse(is_addr_type(addr))
+
+
+if __name__ == "__main__":
+    unittest.main()
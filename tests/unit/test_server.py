@@ -1,18 +1,19 @@
-import pickle
+import shutil
+import tempfile
 import threading
 import unittest
 from pathlib import Path
 from src.server import Server
+from tests.unit.helpers import approved_client
 import os
 from datetime import datetime
-import psutil
 import socket
-import pprint as pp
-from src.schema import get_message_id
-from src.shared_enum_vars import ClientResponseTypes, ServerEventTypes, ServerResponseTypes
+from src.schema import get_message_id, dump_addr
+from src.shared_enum_vars import ClientResponseTypes, ServerResponseTypes
 from dotenv import load_dotenv
 import random
 from time import time
+from functools import lru_cache
 
 # load environmental variables
 project_path = Path(__file__).parent.parent.parent.resolve()
@@ -23,6 +24,10 @@ MESSAGE_LENGTH_HEADER_LENGTH = int(os.getenv('MESSAGE_LENGTH_HEADER_LENGTH'))
 RESPONSE_TYPE_HEADER_LENGTH = int(os.getenv('RESPONSE_TYPE_HEADER_LENGTH'))
 TIMEOUT_SECONDS = int(os.getenv('TIMEOUT_SECONDS'))
 
+# enum values looked up (and the client ones encoded) once instead of on every send / recv in the tests
+_RESP_BYTES = {response_type: response_type.value.encode(FORMAT) for response_type in ClientResponseTypes}
+_MESSAGE_FROM_CLIENT = ServerResponseTypes.MESSAGE_FROM_CLIENT.value
+
 
 def get_server_message(created_at: datetime, client_addr: tuple[str, int], message: ServerResponseTypes) -> dict:
     return {
@@ -30,23 +35,19 @@ def get_server_message(created_at: datetime, client_addr: tuple[str, int], messa
         "created_at": created_at,
         "message": message.value,
         "broadcasted": {
-            "client_name": pickle.dumps(client_addr),
+            "client_name": dump_addr(client_addr),
             "client_connected": True,
             "message_sent_at": None,
             "message_received_at": None
         },
-        "message_id": get_message_id(
-            None,
-            {
-                "created_at": created_at,
-                "broadcasted": {
-                    "client_name": pickle.dumps(client_addr)
-                }
-            }
-        )
+        "message_id": get_message_id(None, {"created_at": created_at, "client_address": client_addr})
     }
 
 
+# keys of an entry in the "broadcasted" list of a client message, in the order get_client_message() fills them in
+_BROADCAST_KEYS = ("client_name", "client_connected", "message_sent_at", "message_received_at")
+
+
 def get_client_message(
         client_sent: datetime,
         server_received: datetime,
@@ -68,27 +69,25 @@ def get_client_message(
         "message": message,
         "client_address": sender_client_addr,
         "broadcasted": [
-            {
-                "client_name": recipient_client_name,
-                "client_connected": client_connected,
-                "message_sent_at": message_sent_at,
-                "message_received_at": message_received_at
-            }
+            dict(zip(_BROADCAST_KEYS, (recipient_client_name, client_connected, message_sent_at, message_received_at)))
         ],
-        "message_id": get_message_id(
-            None,
-            {
-                "created_at": client_sent,
-                "broadcasted": {
-                    "client_name": pickle.dumps(sender_client_addr)
-                }
-            }
-        )
+        "message_id": get_message_id(None, {"created_at": client_sent, "client_address": sender_client_addr})
     }
 
 
-def format_client_message(response_type: ClientResponseTypes, message: str, client_sent_at: datetime) -> str:
-    return response_type.value + f"{len(message):<{MESSAGE_LENGTH_HEADER_LENGTH}}" + client_sent_at.strftime("%Y%m%d%H%M%S%f") + message
+@lru_cache(maxsize=2048)
+def _fmt_ts(dt: datetime) -> bytes:
+    return dt.strftime("%Y%m%d%H%M%S%f").encode(FORMAT)
+
+
+def format_client_message(response_type: ClientResponseTypes | str, message: str, client_sent_at: datetime) -> bytes:
+    # response_type can be given as the raw value of the enum member as well
+    return b"".join((
+        _RESP_BYTES.get(response_type) or response_type.encode(FORMAT),
+        str(len(message)).ljust(MESSAGE_LENGTH_HEADER_LENGTH).encode(FORMAT),
+        _fmt_ts(client_sent_at),
+        message.encode(FORMAT)
+    ))
 
 
 
@@ -105,9 +104,35 @@ class TestServer(unittest.TestCase):
             a. Yes, save
     """
 
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log_current_date = datetime(2022, 12, 4, 22, 59, 15, 9274)
+
+        # the log file is named after log_current_date - keep it in a directory of its own, so that test processes run
+        # in parallel (pytest -n) do not write to the same file
+        cls.log_dir = Path(tempfile.mkdtemp(prefix="esm-log-"))
+
+        cls.client_username = "some_username"
+
+        # randomise ip and port for sample fake client and generate fake_client_username; own generator with a fixed
+        # seed, so that the fake client is the same on every run
+        cls._rng = random.Random(0)
+        cls.random_ip = socket.inet_ntoa(cls._rng.getrandbits(32).to_bytes(4, "big"))
+        cls.random_port = 1000 + cls._rng.getrandbits(13) % 6001
+        cls.fake_client_username = "fake_client_username"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.log_dir, ignore_errors=True)
+
     def setUp(self) -> None:
-        self.log_current_date = datetime(2022, 12, 4, 22, 59, 15, 9274)
-        self.server = Server(_Server__debug=True, _Server__log_file_created_at=self.log_current_date)
+        # a server and a client connection of their own for each test - nothing the previous test left in the server or
+        # unread on the socket can get in the way
+        self.server = Server(
+            _Server__debug=True,
+            _Server__log_file_created_at=self.log_current_date,
+            _Server__log_dir=self.log_dir
+        )
 
         self.passcode = self.server.get_passcode()
         self.wrong_passcode = self.server.get_passcode()[3:]  # remove first few bytes/characters
@@ -118,9 +143,14 @@ class TestServer(unittest.TestCase):
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client_socket.connect(self.server_addr)
 
+        # send the short request/response messages right away instead of letting Nagle's algorithm hold them back
+        self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        # fail instead of hanging if the server never responds
+        self.client_socket.settimeout(TIMEOUT_SECONDS)
+
         # get details about the client
         self.client_addr = self.client_socket.getpeername()
-        self.client_username = "some_username"
 
         # render a sample message that a client could send
         self.client_message = get_client_message(
@@ -132,18 +162,13 @@ class TestServer(unittest.TestCase):
             recipient_client_name="some_other_user"
         )
 
-        # randomise ip and port for sample fake client and generate fake_client_username
-        self.random_ip = ".".join(map(str, (random.randint(0, 255) for _ in range(4))))
-        self.random_port = random.randint(1000, 7000)
-        self.fake_client_username = "fake_client_username"
-
         # list of messages (conversation between self.client_socket and fake client) - all messages were dispatched by
         # the server and received by each client
         self.message_list = [
             get_client_message(
                 client_sent=datetime(2022, 12, 2, 2, i, 36, 123456),
                 server_received=datetime(2022, 12, 2, 2, i, 38, 123456),
-                sender_client_addr=self.client_addr if bool(i % 2) else (self.random_ip, self. random_port),
+                sender_client_addr=self.client_addr if bool(i % 2) else (self.random_ip, self.random_port),
                 sender_client_name=self.client_username if bool(i % 2) else self.fake_client_username,
                 message=f"Message #{i + 1}",
                 recipient_client_name=self.fake_client_username if bool(i % 2) else self.client_username,
@@ -153,20 +178,30 @@ class TestServer(unittest.TestCase):
             ) for i in range(10)
         ]
 
-        self.log_file_path = project_path / "log"
-        self.log_filenames = []
-        self.log_current_date_str = "2022-12-04 22:59:15.009274"
-        self.sample_log_filename = "log_" + self.log_current_date.strftime("%Y%m%d%H%M%S%f") + ".txt"
-
     def tearDown(self) -> None:
-        if self.log_filenames:
-            for filename in self.log_filenames:
-                os.remove(self.log_file_path / filename)
+        self.client_socket.close()
+        self.server.close()
+
+    def _await(self, thread: threading.Thread) -> None:
+        """Wait for the thread to finish, fail if it does not within TIMEOUT_SECONDS."""
+        thread.join(TIMEOUT_SECONDS)
+        self.assertFalse(thread.is_alive(), "The thread timed-out.")
+
+    def assertMessageListEqual(self, expected: list[dict], actual: list[dict]) -> None:
+        """
+        Compare two lists of messages: order of the messages first (by message_id), then each pair of messages on its
+        own - a failure points at the message that differs instead of dumping both lists.
+        """
+        self.assertEqual([m["message_id"] for m in expected], [m["message_id"] for m in actual])
+
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            with self.subTest(message_index=i):
+                self.assertDictEqual(e, a)
 
     def test_handle_clients_new_connection_correct_passcode_clients_list(self) -> None:
         self.server.handle_clients(client_response_code='p', client_message=self.passcode)
 
-        expected = [{"client_name": "", "client_address": self.client_addr}]
+        expected = [approved_client("", self.client_addr)]
         actual = self.server.sockets_list
 
         self.assertEqual(expected, actual)
@@ -203,7 +238,7 @@ class TestServer(unittest.TestCase):
         self.assertEqual(expected, actual)
 
     def test_handle_clients_client_disconnected_after_username_list_of_clients(self) -> None:
-        self.server.approved_connections = [{"client_name": self.client_username, "client_address": self.client_addr}]
+        self.server.clients_list = [approved_client(self.client_username, self.client_addr)]
 
         self.server.handle_clients(
             client_response_code=ClientResponseTypes.CLIENT_DISCONNECTED,
@@ -216,7 +251,7 @@ class TestServer(unittest.TestCase):
         self.assertEqual(expected, actual)
 
     def test_handle_clients_client_disconnected_before_username_list_of_clients(self) -> None:
-        self.server.approved_connections = [{"client_name": "", "client_address": self.client_addr}]
+        self.server.clients_list = [approved_client("", self.client_addr)]
 
         self.server.handle_clients(
             client_response_code=ClientResponseTypes.CLIENT_DISCONNECTED,
@@ -229,7 +264,7 @@ class TestServer(unittest.TestCase):
         self.assertEqual(expected, actual)
 
     def test_handle_clients_client_disconnected_before_passcode_list_of_clients(self) -> None:
-        self.server.approved_connections = []
+        self.server.clients_list = []
 
         self.server.handle_clients(
             client_response_code=ClientResponseTypes.CLIENT_DISCONNECTED,
@@ -305,15 +340,9 @@ class TestServer(unittest.TestCase):
     def test_handle_incoming_messages_new_regular_message(self) -> None:
 
         # list contains self.client and the self.client_message recipient name with randomised port and ip
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            },
-            {
-                "client_name": self.client_message["broadcasted"][0]["client_name"],
-                "client_address": (self.random_ip, self.random_port)
-            }
+        self.server.clients_list = [
+            approved_client(self.client_username, self.client_addr),
+            approved_client(self.client_message["broadcasted"][0]["client_name"], (self.random_ip, self.random_port))
         ]
 
         # run handle_incoming_messages() in a separate threat with execute_once set to True to shut down after receiving
@@ -333,7 +362,7 @@ class TestServer(unittest.TestCase):
                 ClientResponseTypes.REGULAR_TEXT_MESSAGE,
                 self.client_message["message"],
                 self.client_message["client_sent"]
-            ).encode(FORMAT)
+            )
         )
 
         expected = self.client_message
@@ -341,43 +370,27 @@ class TestServer(unittest.TestCase):
         # remove server_received key - it is defined at run-time inside the thread and will be unknown
         del expected["server_received"]
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if the thread is finished (received the message)
-        while time() < end_time:
-
-            if not handle_incoming_messages_thread.is_alive():
+        # wait for the thread to finish
+        self._await(handle_incoming_messages_thread)
 
-                messages_list = self.server.client_messages.waiting_messages
+        messages_list = self.server.client_messages.waiting_messages
 
-                # if any message found perform tests
-                if messages_list:
+        # fail if no message found, otherwise perform tests
+        self.assertTrue(messages_list, "No message found.")
 
-                    actual = messages_list[0]
-
-                    # verify if the server_received key is in the message and remove it
-                    self.assertIn("server_received", list(actual.keys()))
-                    del actual["server_received"]
-
-                    self.assertEqual(expected, actual)
+        actual = messages_list[0]
 
-                    break
+        # verify if the server_received key is in the message and remove it
+        self.assertIn("server_received", list(actual.keys()))
+        del actual["server_received"]
 
-        else:
-            # timeout
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertEqual(expected, actual)
 
     def test_handle_incoming_messages_received_message_response(self) -> None:
         # here the client with randomised ip and port number is the sender while self.client_socket is the recipient
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            },
-            {
-                "client_name": self.client_message["broadcasted"][0]["client_name"],
-                "client_address": (self.random_ip, self.random_port)
-            }
+        self.server.clients_list = [
+            approved_client(self.client_username, self.client_addr),
+            approved_client(self.client_message["broadcasted"][0]["client_name"], (self.random_ip, self.random_port))
         ]
 
         # generate message that has been sent from the fake client, sent from the server and is to be received
@@ -412,35 +425,20 @@ class TestServer(unittest.TestCase):
                 ClientResponseTypes.MESSAGE_RECEIVED_RESPONSE,
                 "",
                 message_received_at
-            ).encode(FORMAT)
+            )
         )
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if the thread is finished (received the message)
-        while time() < end_time:
-
-            if not handle_incoming_messages_thread.is_alive():
-
-                expected = message_received_at
-                actual = self.server.client_messages.waiting_messages[0]["broadcasted"][0]["message_received_at"]
+        # wait for the thread to finish
+        self._await(handle_incoming_messages_thread)
 
-                self.assertEqual(expected, actual)
+        expected = message_received_at
+        actual = self.server.client_messages.waiting_messages[0]["broadcasted"][0]["message_received_at"]
 
-                break
-
-        else:
-            # timeout
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertEqual(expected, actual)
 
     def test_handle_incoming_messages_everything_ok_response(self) -> None:
-        # populate approved_connections to avoid any errors
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            }
-        ]
+        # populate clients_list to avoid any errors
+        self.server.clients_list = [approved_client(self.client_username, self.client_addr)]
 
         # run handle_incoming_messages() in a separate threat with execute_once set to True to shut down after receiving
         # one message
@@ -459,34 +457,20 @@ class TestServer(unittest.TestCase):
                 ClientResponseTypes.EVERYTHING_OK,
                 "",
                 datetime.now()
-            ).encode(FORMAT)
+            )
         )
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if the thread is finished (received the message)
-        while time() < end_time:
-
-            if not handle_incoming_messages_thread.is_alive():
-
-                what_has_been_run = self.server.methods_called_debug
-
-                if what_has_been_run:
-
-                    expected = what_has_been_run
-                    actual = [Server.handle_incoming_messages.__name__]
-
-                    self.assertEqual(expected, actual)
+        # wait for the thread to finish
+        self._await(handle_incoming_messages_thread)
 
-                    break
+        what_has_been_run = self.server.methods_called_debug
 
-                else:
+        self.assertTrue(what_has_been_run, "what_has_been_run is empty.")
 
-                    self.fail("what_has_been_run is empty.")
+        expected = what_has_been_run
+        actual = [Server.handle_incoming_messages.__name__]
 
-        else:
-            # timeout
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertEqual(expected, actual)
 
     @unittest.skip("Client no longer is responsible for figuring out if there is any message missing and so is "
                    "handle_incoming_messages() function.")
@@ -495,12 +479,7 @@ class TestServer(unittest.TestCase):
 
     def test_handle_incoming_messages_username_given(self) -> None:
         # client was approved but did not send username yet - populate to avoid errors
-        self.server.approved_connections = [
-            {
-                "client_name": "",
-                "client_address": self.client_addr
-            }
-        ]
+        self.server.clients_list = [approved_client("", self.client_addr)]
 
         # run handle_incoming_messages() in a separate threat with execute_once set to True to shut down after receiving
         # one message
@@ -519,35 +498,21 @@ class TestServer(unittest.TestCase):
                 ClientResponseTypes.USERNAME_GIVEN,
                 self.client_username,
                 datetime.now()
-            ).encode(FORMAT)
+            )
         )
 
-        end_time = time() + TIMEOUT_SECONDS
+        # wait for the thread to finish
+        self._await(handle_incoming_messages_thread)
 
-        # keep checking if the thread is finished (received the message)
-        while time() < end_time:
-
-            if not handle_incoming_messages_thread.is_alive():
-
-                what_has_been_run = self.server.methods_called_debug
-
-                if what_has_been_run:
+        what_has_been_run = self.server.methods_called_debug
 
-                    self.assertIn(Server.handle_clients.__name__, what_has_been_run)
+        self.assertTrue(what_has_been_run, "what_has_been_run is empty.")
 
-                    break
-
-                else:
-
-                    self.fail("what_has_been_run is empty.")
-
-        else:
-            # timeout
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertIn(Server.handle_clients.__name__, what_has_been_run)
 
     def test_handle_incoming_messages_passcode_given(self) -> None:
         # start with no approved client - self.client_socket is yet to send the passcode
-        self.server.approved_connections = []
+        self.server.clients_list = []
 
         # run handle_incoming_messages() in a separate threat with execute_once set to True to shut down after receiving
         # one message
@@ -566,44 +531,25 @@ class TestServer(unittest.TestCase):
                 ClientResponseTypes.PASSCODE_GIVEN,
                 "",  # empty passcode (we don't care if it's going to be approved or not)
                 datetime.now()
-            ).encode(FORMAT)
+            )
         )
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if the thread is finished (received the message)
-        while time() < end_time:
+        # wait for the thread to finish
+        self._await(handle_incoming_messages_thread)
 
-            if not handle_incoming_messages_thread.is_alive():
+        what_has_been_run = self.server.methods_called_debug
 
-                what_has_been_run = self.server.methods_called_debug
+        self.assertTrue(what_has_been_run, "what_has_been_run is empty.")
 
-                if what_has_been_run:
-
-                    self.assertIn(Server.handle_clients.__name__, what_has_been_run)
-
-                    break
-
-                else:
-
-                    self.fail("what_has_been_run is empty.")
-
-        else:
-            # timeout
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertIn(Server.handle_clients.__name__, what_has_been_run)
 
     def test_handle_incoming_messages_sort_messages(self) -> None:
         # all messages received and sent by the server and received by the client in random order besides 9th (1-10) in
         # the list the one sent by the client_socket
         msg_list = self.message_list[:-2] + [self.message_list[-1]]
-        self.server.client_messages.waiting_messages = random.sample(msg_list, len(msg_list))
+        self.server.client_messages.waiting_messages = self._rng.sample(msg_list, len(msg_list))
 
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            }
-        ]
+        self.server.clients_list = [approved_client(self.client_username, self.client_addr)]
 
         handle_incoming_messages_thread = threading.Thread(
             target=self.server.handle_incoming_messages,
@@ -620,33 +566,25 @@ class TestServer(unittest.TestCase):
                 ClientResponseTypes.REGULAR_TEXT_MESSAGE,
                 self.message_list[-2]["message"],
                 self.message_list[-2]["timestamps"]["client_sent"]
-            ).encode(FORMAT)
+            )
         )
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if the thread is finished (received the message)
-        while time() < end_time:
-
-            if not handle_incoming_messages_thread.is_alive():
-
-                expected = self.message_list
+        # wait for the thread to finish
+        self._await(handle_incoming_messages_thread)
 
-                # set to None - the newly received message
-                expected[-2]["broadcasted"][0]["message_sent_at"] = None
-                expected[-2]["broadcasted"][0]["message_received_at"] = None
+        expected = self.message_list
 
-                actual = self.server.client_messages.waiting_messages
+        # set to None - the newly received message
+        expected[-2]["broadcasted"][0]["message_sent_at"] = None
+        expected[-2]["broadcasted"][0]["message_received_at"] = None
 
-                # remove timestamps.server_received as they will definitely be different
-                del expected[-2]["timestamps"]["server_received"]
-                del actual[-2]["timestamps"]["server_received"]
+        actual = self.server.client_messages.waiting_messages
 
-                self.assertEqual(expected, actual)
+        # remove timestamps.server_received as they will definitely be different
+        del expected[-2]["timestamps"]["server_received"]
+        del actual[-2]["timestamps"]["server_received"]
 
-        else:
-            # timeout
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertMessageListEqual(expected, actual)
 
     def test_message_dispatcher_everyone_received_messages_nothing_to_do(self) -> None:
         # all messages sent, all messages received
@@ -660,31 +598,17 @@ class TestServer(unittest.TestCase):
         )
         message_dispatcher_thread.start()
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if the thread is finished
-        while time() < end_time:
-
-            if not message_dispatcher_thread.is_alive():
-
-                what_has_been_run = self.server.methods_called_debug
-
-                if what_has_been_run:
-
-                    expected = [Server.message_dispatcher.__name__]
-                    actual = what_has_been_run
-
-                    self.assertEqual(expected, actual)
+        # wait for the thread to finish
+        self._await(message_dispatcher_thread)
 
-                    break
+        what_has_been_run = self.server.methods_called_debug
 
-                else:
+        self.assertTrue(what_has_been_run, "what_has_been_run is empty.")
 
-                    self.fail("what_has_been_run is empty.")
+        expected = [Server.message_dispatcher.__name__]
+        actual = what_has_been_run
 
-        else:
-            # timeout
-            self.fail("message_dispatcher() timed-out.")
+        self.assertEqual(expected, actual)
 
     def test_message_dispatcher_one_message_to_send(self) -> None:
         # all messages sent and received besides one, at the end of the list
@@ -694,15 +618,9 @@ class TestServer(unittest.TestCase):
         self.server.client_messages.waiting_messages[-1]["broadcasted"][0]["message_received_at"] = None
 
         # here the client with randomised ip and port number is the sender while self.client_socket is the recipient
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            },
-            {
-                "client_name": self.client_message["broadcasted"][0]["client_name"],
-                "client_address": (self.random_ip, self.random_port)
-            }
+        self.server.clients_list = [
+            approved_client(self.client_username, self.client_addr),
+            approved_client(self.client_message["broadcasted"][0]["client_name"], (self.random_ip, self.random_port))
         ]
 
         message_dispatcher_thread = threading.Thread(
@@ -718,7 +636,7 @@ class TestServer(unittest.TestCase):
         # keep checking if any messages were received
         while time() < end_time:
 
-            expected = ServerResponseTypes.MESSAGE_FROM_CLIENT.value
+            expected = _MESSAGE_FROM_CLIENT
             actual = self.client_socket.recv(RESPONSE_TYPE_HEADER_LENGTH).decode('utf-8')
 
             self.assertEqual(expected, actual)
@@ -737,15 +655,9 @@ class TestServer(unittest.TestCase):
             self.server.client_messages.waiting_messages[-(i + 1)]["broadcasted"][0]["message_received_at"] = None
 
         # here the client with randomised ip and port number is the sender while self.client_socket is the recipient
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            },
-            {
-                "client_name": self.client_message["broadcasted"][0]["client_name"],
-                "client_address": (self.random_ip, self.random_port)
-            }
+        self.server.clients_list = [
+            approved_client(self.client_username, self.client_addr),
+            approved_client(self.client_message["broadcasted"][0]["client_name"], (self.random_ip, self.random_port))
         ]
 
         message_dispatcher_thread = threading.Thread(
@@ -756,269 +668,23 @@ class TestServer(unittest.TestCase):
         )
         message_dispatcher_thread.start()
 
-        end_time = time() + TIMEOUT_SECONDS
-
-        # keep checking if any messages were received
-        while time() < end_time:
-
-            for i in range(3):
+        # read the responses through a buffered reader - the headers and the message come out of as few recv() calls
+        # as possible and a message split between two segments is read in full; stop as soon as all three arrived
+        try:
+            with self.client_socket.makefile('rb', buffering=8192) as reader:
+                for _ in range(3):
+                    expected = _MESSAGE_FROM_CLIENT
+                    actual = reader.read(RESPONSE_TYPE_HEADER_LENGTH).decode('utf-8')
 
-                expected = ServerResponseTypes.MESSAGE_FROM_CLIENT.value
-                actual = self.client_socket.recv(RESPONSE_TYPE_HEADER_LENGTH).decode('utf-8')
+                    # empty the buffer
+                    msg_len = int(reader.read(MESSAGE_LENGTH_HEADER_LENGTH).decode('utf-8'))
+                    _ = reader.read(msg_len)
 
-                # empty the buffer
-                msg_len = int(self.client_socket.recv(MESSAGE_LENGTH_HEADER_LENGTH).decode('utf-8'))
-                _ = self.client_socket.recv(msg_len)
-
-                self.assertEqual(expected, actual)
+                    self.assertEqual(expected, actual)
 
-        else:
-            # timeout
+        except socket.timeout:
             self.fail("message_dispatcher() timed-out.")
 
-    def test_log_text_file_path(self) -> None:
-        log_filename = self.server.log_filename
-
-        self.log_filenames += log_filename
-        self.server.log(ServerEventTypes.STARTING, datetime.now())
-
-        self.assertTrue(os.path.exists(self.log_file_path / log_filename))
-
-    def test_log_filename(self) -> None:
-        current_date = datetime.now()
-        server_test = Server(__log_file_created_at=current_date)
-        server_test.log(ServerEventTypes.STARTING, datetime.now())
-
-        self.log_filenames += server_test.log_filename
-
-        expected = "log_" + current_date.strftime("%Y%m%d%H%M%S%f") + ".txt"
-        actual = server_test.log_filename
-
-        self.assertEqual(expected, actual)
-        self.assertTrue(os.path.exists(expected))
-
-    def test_log_starting(self) -> None:
-        self.server.log(ServerEventTypes.STARTING, self.log_current_date)
-
-        expected = f"{self.log_current_date_str} [STARTING] Server is booting up..."
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_started(self) -> None:
-        some_global_vars = {
-            "CLIENT_LIMIT": 2,
-            "PASSCODE": self.passcode
-        }
-
-        self.server.log(ServerEventTypes.STARTED, self.log_current_date, vars=some_global_vars)
-
-        expected = f"{self.log_current_date_str} [STARTED] Server started. {[f'{k} = {v}' for k, v in some_global_vars]}"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_listening(self) -> None:
-        self.server.log(ServerEventTypes.LISTENING, self.log_current_date, server_addr=self.server_addr)
-
-        expected = f"{self.log_current_date_str} [LISTENING] Server is listening at on {self.server_addr[0]}:{self.server_addr[1]}"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_attempted_connection_accepted(self) -> None:
-        self.server.log(
-            ServerEventTypes.ATTEMPTED_CONNECTION,
-            self.log_current_date,
-            client_addr=self.client_addr,
-            accepted=True
-        )
-
-        expected = f"{self.log_current_date_str} [ATTEMPTED_CONNECTION] Attempted connection from {self.client_addr[0]}:{self.client_addr[1]}."
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_attempted_connection_rejected(self) -> None:
-        self.server.log(
-            ServerEventTypes.ATTEMPTED_CONNECTION,
-            self.log_current_date,
-            client_addr=self.client_addr,
-            accepted=False,
-            reason="reached max number of clients (2)"
-        )
-
-        expected = f"{self.log_current_date_str} [ATTEMPTED_CONNECTION] Attempted connection from {self.client_addr[0]}:{self.client_addr[1]}. Rejected. Reason: 'reached max number of clients (2)'"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_new_client(self) -> None:
-        self.server.log(ServerEventTypes.NEW_CLIENT, self.log_current_date, client_addr=self.client_addr, client_username=self.client_username)
-
-        expected = f"{self.log_current_date_str} [NEW CLIENT] New client accepted {self.client_addr[0]}:{self.client_addr[1]} as '{self.client_username}'"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_active_clients(self) -> None:
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            },
-            {
-                "client_name": self.fake_client_username,
-                "client_address": (self.random_ip, self.random_port)
-            }
-        ]
-
-        self.server.log(ServerEventTypes.ACTIVE_CLIENTS, self.log_current_date, active_clients=self.server.approved_connections)
-
-        expected = f"{self.log_current_date_str} [ACTIVE CLIENTS] Currently active clients: '{self.client_username}' {self.client_addr[0]}:{self.client_addr[1]}, '{self.fake_client_username}' {self.random_ip}:{self.random_port}"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_client_disconnected(self) -> None:
-        self.server.approved_connections = [
-            {
-                "client_name": self.client_username,
-                "client_address": self.client_addr
-            }
-        ]
-
-        self.server.log(ServerEventTypes.CLIENT_DISCONNECTED, self.log_current_date, client_username=self.client_username, client_addr=self.client_addr)
-
-        expected = f"{self.log_current_date_str} [CLIENT DISCONNECTED] Client '{self.client_username}' {self.client_addr[0]}:{self.client_addr[1]} disconnected."
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_message_received(self) -> None:
-        message = {
-            "client_name": "foo",
-            "timestamps": {
-                "client_sent": datetime.now(),
-                "server_received": datetime.now(),
-            },
-            "message": "bar",
-            "broadcasted": [
-                {
-                    "client_name": "bar",
-                    "client_connected": True
-                }
-            ],
-            "message_id": "123"
-        }
-
-        self.server.log(ServerEventTypes.MESSAGE_RECEIVED, self.log_current_date, message=message)
-
-        expected = f"{self.log_current_date_str} [MESSAGE RECEIVED] Received message message_id='123', client_name=" \
-                   f"'foo', timestamps.client_sent={message['timestamps']['client_sent']}, timestamps.server_" \
-                   f"received={message['timestamps']['server_received']}, message='bar', broadcasted.0.client_name=" \
-                   f"'bar', broadcasted.0.client_connected=True"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_message_dispatched(self) -> None:
-        self.server.log(ServerEventTypes.MESSAGE_DISPATCHED, self.log_current_date, message_id='123', timstamp=self.log_current_date)
-
-        expected = f"{self.log_current_date_str} [MESSAGE DISPATCHED] Dispatched message '123' at {self.log_current_date.strftime('%Y-%m-%d %H:%M:%S.%f')}."
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_messaged_delivered(self) -> None:
-        self.server.log(ServerEventTypes.MESSAGED_DELIVERED, self.log_current_date, message_id='123', timstamp=self.log_current_date)
-
-        expected = f"{self.log_current_date_str} [MESSAGED DELIVERED] Delivered message '123' at {self.log_current_date.strftime('%Y-%m-%d %H:%M:%S.%f')}"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_missing_message(self) -> None:
-        self.server.log(ServerEventTypes.MISSING_MESSAGE, self.log_current_date, message_id='123', client_add=self.client_addr, client_username=self.client_username)
-
-        expected = f"{self.log_current_date_str} [MISSING MESSAGE] Found message '123' sent but not delivered to '{self.client_username}' {self.client_addr[0]}:{self.client_addr[1]}"
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
-    def test_log_shutting_down(self) -> None:
-        self.server.log(ServerEventTypes.SHUTTING_DOWN, self.log_current_date)
-
-        expected = f"{self.log_current_date_str} [SHUTTING DOWN] Server is shutting down..."
-
-        with open(self.log_file_path / self.sample_log_filename, 'r') as f:
-            lines = f.readlines()
-
-        actual = lines[0]
-
-        self.assertEqual(1, len(lines))
-        self.assertEqual(expected, actual)
-
     def test_handle_missing_message(self) -> None:
         pass
 
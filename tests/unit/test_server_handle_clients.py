@@ -1,14 +1,17 @@
-import pickle
 import unittest
 import socket
 
+from src.schema import dump_addr, encode_addr
 from src.server import Server
 from src.shared_enum_vars import ClientResponseTypes, ServerResponseTypes
 
+# resolved once for all the tests - clients bind to it
+_LOCAL_IP = socket.gethostbyname(socket.gethostname())
+
 
 class TestServerHandleClients(unittest.TestCase):
     def setUp(self) -> None:
-        # Spin up the server
+        # Spin up the server - a new one for each test, so that nothing is left over from the previous one
         self.server = Server()
         self.server_addr = self.server.get_addr()
 
@@ -16,23 +19,35 @@ class TestServerHandleClients(unittest.TestCase):
         self.correct_passcode = self.server.get_passcode()
         self.wrong_passcode = self.server.get_passcode()[3:]  # remove first few bytes/characters
 
-        local_ip = socket.gethostbyname(socket.gethostname())
+        # Connect both clients. handle_clients() is given the sockets the server accepted - the ones
+        # handle_incoming_messages() passes to it - whose peer names are the client addresses. The client ends are
+        # kept only to be closed in tearDown().
+        self.client_end_1, self.client_socket_1 = self.__connect_client()
+        self.client_addr_1 = self.client_socket_1.getpeername()
+        self.client_username_1 = "client1"
 
-        # Instantiate first client socket and connect to the server
-        self.client_socket_1 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket_1.bind((local_ip, 0))
-        self.client_socket_1.connect(self.server_addr)
+        self.client_end_2, self.client_socket_2 = self.__connect_client()
+        self.client_addr_2 = self.client_socket_2.getpeername()
+        self.client_username_2 = "client2"
 
-        # Get details about the first client
-        self.client_addr_1 = self.client_socket_1.getsockname()
-        self.client_username_1 = "client1"
+    def tearDown(self) -> None:
+        for sock in (self.client_end_1, self.client_socket_1, self.client_end_2, self.client_socket_2):
+            sock.close()
 
-        self.client_socket_2 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket_2.bind((local_ip, 0))
-        self.client_socket_2.connect(self.server_addr)
+        self.server.close()
 
-        self.client_addr_2 = self.client_socket_2.getsockname()
-        self.client_username_2 = "client2"
+    def __connect_client(self) -> tuple[socket.socket, socket.socket]:
+        """
+        Connect a client to the server and accept the connection.
+        :return: client end of the connection, server end of the connection
+        """
+        client_end = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client_end.bind((_LOCAL_IP, 0))
+        client_end.connect(self.server_addr)
+
+        server_end, _ = self.server.server_socket.accept()
+
+        return client_end, server_end
 
     def __test_handle_clients_server_messages_list(
             self,
@@ -50,7 +65,7 @@ class TestServerHandleClients(unittest.TestCase):
             "response_type": server_resp_type,
             "broadcasted": [
                 {
-                    "client_name": self.client_username_1 if client_name else pickle.dumps(self.client_addr_1),
+                    "client_name": self.client_username_1 if client_name else dump_addr(self.client_addr_1),
                     "message_sent_at": None,
                     "message_received_at": None
                 }
@@ -182,7 +197,7 @@ class TestServerHandleClients(unittest.TestCase):
                 }
             ],
             "server_addr": self.server.get_addr(),
-            "info": ''.join([x.zfill(3) for x in self.client_addr_2[0].split('.')]) + str(self.client_addr_2[1]).zfill(6) + self.client_username_2
+            "info": encode_addr(self.client_addr_2) + self.client_username_2
         }
 
         actual = self.server.server_messages.waiting_messages
@@ -232,7 +247,7 @@ class TestServerHandleClients(unittest.TestCase):
 
         self.__test_handle_clients_server_messages_list(
             server_resp_type=ServerResponseTypes.CLIENT_DISCONNECTED,
-            info=''.join([x.zfill(3) for x in self.client_addr_2[0].split('.')]) + str(self.client_addr_2[1]).zfill(6)
+            info=encode_addr(self.client_addr_2)
         )
 
     def test_handle_clients_client_disconnected_before_passcode(self) -> None:
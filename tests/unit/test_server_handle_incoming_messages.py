@@ -1,7 +1,8 @@
 import unittest
 import socket
-from threading import Thread
-from time import time
+import struct
+from threading import Thread, Condition
+from functools import wraps
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -21,6 +22,24 @@ MESSAGE_ID_HEADER_LENGTH = int(os.getenv('MESSAGE_ID_HEADER_LENGTH'))
 MESSAGE_LENGTH_HEADER_LENGTH = int(os.getenv('MESSAGE_LENGTH_HEADER_LENGTH'))
 TIMEOUT_SECONDS = int(os.getenv('TIMEOUT_SECONDS'))
 
+# response type field of the header, encoded once per ClientResponseTypes instead of on every send
+_PREFIX = {response_type: response_type.value.encode(FORMAT) for response_type in ClientResponseTypes}
+
+# header of a message sent by a client: response type, timestamp, message length (left-aligned, padded with spaces)
+_HEADER = struct.Struct(f"{RESPONSE_TYPE_HEADER_LENGTH}s{TIMESTAMP_HEADER_LENGTH}s{MESSAGE_LENGTH_HEADER_LENGTH}s")
+
+
+def _client_message(response_type: ClientResponseTypes, sent_at: datetime, message: str) -> bytes:
+    return _HEADER.pack(
+        _PREFIX[response_type],
+        sent_at.strftime('%Y%m%d%H%M%S%f').encode(FORMAT),
+        str(len(message)).ljust(MESSAGE_LENGTH_HEADER_LENGTH).encode(FORMAT)
+    ) + message.encode(FORMAT)
+
+
+# resolved once for all the tests - clients bind to it
+_LOCAL_IP = socket.gethostbyname(socket.gethostname())
+
 
 class TestServerHandleIncomingMessages(unittest.TestCase):
     def setUp(self) -> None:
@@ -31,13 +50,11 @@ class TestServerHandleIncomingMessages(unittest.TestCase):
         # Get the correct passcode
         self.passcode = self.server.get_passcode()
 
-        local_ip = socket.gethostbyname(socket.gethostname())
-
         # Instantiate clients sockets and bind to the ip/port
         self.client_socket_1 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket_1.bind((local_ip, 0))
+        self.client_socket_1.bind((_LOCAL_IP, 0))
         self.client_socket_2 = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket_2.bind((local_ip, 0))
+        self.client_socket_2.bind((_LOCAL_IP, 0))
 
         # Get details about clients
         self.client_addr_1 = self.client_socket_1.getsockname()
@@ -52,66 +69,96 @@ class TestServerHandleIncomingMessages(unittest.TestCase):
             {"client_name": self.client_username_2, "addr": self.client_addr_2}
         ]
 
+        # tests wait on it for the server to change the client messages
+        self.client_messages_changed = self._notify_on_change(self.server.client_messages)
+
+    def tearDown(self) -> None:
+        self.client_socket_1.close()
+        self.client_socket_2.close()
+        self.server.close()
+
+    @staticmethod
+    def _notify_on_change(message_handler) -> Condition:
+        """
+        Make the message handler notify the returned condition after every append_message() and query() call - a test
+        can then wait for the server to change the messages instead of polling them.
+        """
+        changed = Condition()
+
+        for name in ("append_message", "query"):
+
+            def notifying(*args, _method=getattr(message_handler, name), **kwargs):
+                result = _method(*args, **kwargs)
+
+                with changed:
+                    changed.notify_all()
+
+                return result
+
+            setattr(message_handler, name, wraps(getattr(message_handler, name))(notifying))
+
+        return changed
+
     def test_handle_incoming_messages_regular_text_message(self) -> None:
+        # connect before the server starts selecting on the client socket - an unconnected one is reported readable
+        self.client_socket_1.connect(self.server_addr)
 
         # run the handle_incoming_messages function in a thread
         handle_incoming_messages_thread = Thread(target=self.server.handle_incoming_messages)
         handle_incoming_messages_thread.start()
 
         client_sent = datetime.now()
-        self.client_socket_1.connect(self.server_addr)
-        self.client_socket_1.send(f"{ClientResponseTypes.REGULAR_TEXT_MESSAGE.value}"
-                                  f"{client_sent.strftime('%Y%m%d%H%M%S%f')}"
-                                  f"{len('foo'):<{MESSAGE_LENGTH_HEADER_LENGTH}}"
-                                  f"foo".encode(FORMAT))
+        self.client_socket_1.send(_client_message(ClientResponseTypes.REGULAR_TEXT_MESSAGE, client_sent, 'foo'))
 
-        end_time = time() + TIMEOUT_SECONDS
+        with self.client_messages_changed:
+            received = self.client_messages_changed.wait_for(
+                lambda: self.server.client_messages.waiting_messages,
+                TIMEOUT_SECONDS
+            )
 
-        while time() < end_time:
-            if self.server.client_messages.waiting_messages:
-                expected = [
+        if not received:
+            self.fail("handle_incoming_messages() timed-out.")
+
+        expected = [
+            {
+                "header": len('foo'),
+                "client_name": self.client_username_1,
+                "timestamps": {
+                    "client_sent": client_sent,
+                },
+                "message": 'foo',
+                "client_address": self.client_addr_1,
+                "broadcasted": [
                     {
-                        "header": len('foo'),
-                        "client_name": self.client_username_1,
-                        "timestamps": {
-                            "client_sent": client_sent,
-                        },
-                        "message": 'foo',
-                        "client_address": self.client_addr_1,
-                        "broadcasted": [
-                            {
-                                "client_name": self.client_username_2,
-                                "message_sent_at": None,
-                                "message_received_at": None
-                            }
-                        ],
-                        "message_id": get_message_id(
-                            None,
-                            {
-                                "timestamps": client_sent,
-                                "client_address": self.client_addr_1
-                            }
-                        )
+                        "client_name": self.client_username_2,
+                        "message_sent_at": None,
+                        "message_received_at": None
                     }
-                ]  # removed timestamps.server_received
-
-                actual = self.server.client_messages.waiting_messages
-
-                self.assertEqual(1, len(actual))
-                self.assertIn("timestamps", actual[0].keys())
-                self.assertIn("server_received", actual[0]["timestamps"].keys())
-
-                del actual[0]["timestamps"]["server_received"]
+                ],
+                "message_id": get_message_id(
+                    None,
+                    {
+                        "timestamps": client_sent,
+                        "client_address": self.client_addr_1
+                    }
+                )
+            }
+        ]  # removed timestamps.server_received
 
-                self.assertEqual(expected, actual)
+        actual = self.server.client_messages.waiting_messages
 
-                break
+        self.assertEqual(1, len(actual))
+        self.assertIn("timestamps", actual[0].keys())
+        self.assertIn("server_received", actual[0]["timestamps"].keys())
 
-        else:
+        del actual[0]["timestamps"]["server_received"]
 
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertEqual(expected, actual)
 
     def test_handle_incoming_messages_message_received_response(self) -> None:
+        # connect before the server starts selecting on the client socket - an unconnected one is reported readable
+        self.client_socket_2.connect(self.server_addr)
+
         # run the handle_incoming_messages function in a thread
         handle_incoming_messages_thread = Thread(target=self.server.handle_incoming_messages)
         handle_incoming_messages_thread.start()
@@ -144,31 +191,29 @@ class TestServerHandleIncomingMessages(unittest.TestCase):
             }
         ]
 
-        self.client_socket_2.connect(self.server_addr)
-        self.client_socket_2.send(f"{ClientResponseTypes.MESSAGE_RECEIVED_RESPONSE.value}"
-                                  f"{client_received.strftime('%Y%m%d%H%M%S%f')}"
-                                  f"{MESSAGE_ID_HEADER_LENGTH:<{MESSAGE_LENGTH_HEADER_LENGTH}}"
-                                  f"{message_id}".encode(FORMAT))
+        self.client_socket_2.send(
+            _client_message(ClientResponseTypes.MESSAGE_RECEIVED_RESPONSE, client_received, message_id)
+        )
 
-        end_time = time() + TIMEOUT_SECONDS
+        with self.client_messages_changed:
+            received = self.client_messages_changed.wait_for(
+                lambda: (
+                    self.server.client_messages.waiting_messages[0]["broadcasted"][0]["message_received_at"] is not None
+                ),
+                TIMEOUT_SECONDS
+            )
 
-        while time() < end_time:
-            if self.server.client_messages.waiting_messages[0]["broadcasted"][0]["message_received_at"] is not None:
-
-                expected = self.server.client_messages.waiting_messages
-                expected[0]["broadcasted"][0]["message_received_at"] = client_received
-
-                actual = self.server.client_messages.waiting_messages
-
-                self.assertEqual(1, len(actual))
+        if not received:
+            self.fail("handle_incoming_messages() timed-out.")
 
-                self.assertEqual(expected, actual)
+        expected = self.server.client_messages.waiting_messages
+        expected[0]["broadcasted"][0]["message_received_at"] = client_received
 
-                break
+        actual = self.server.client_messages.waiting_messages
 
-        else:
+        self.assertEqual(1, len(actual))
 
-            self.fail("handle_incoming_messages() timed-out.")
+        self.assertEqual(expected, actual)
 
     def test_handle_incoming_messages_username_given(self) -> None:
         pass
@@ -1,8 +1,362 @@
+import linecache
+import shutil
+import tempfile
 import unittest
+from pathlib import Path
+from src.server import Server
+from tests.unit.helpers import approved_client
+import os
+from datetime import datetime
+from src.shared_enum_vars import ServerEventTypes
+
+
+def _log_name(dt: datetime) -> str:
+    # name of the log file of a server created at dt
+    return f"log_{dt:%Y%m%d%H%M%S%f}.txt"
 
 
 class TestServerLog(unittest.TestCase):
-    pass
+    @classmethod
+    def setUpClass(cls) -> None:
+        # log files go to a temporary directory - in memory (/dev/shm) where available
+        cls.log_file_path = Path(
+            tempfile.mkdtemp(prefix="esm-log-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        )
+
+        cls.log_current_date = datetime(2022, 12, 4, 22, 59, 15, 9274)
+
+        # the log only renders the addresses, no connection to the server is needed
+        cls.client_addr = ("127.0.0.1", 50000)
+        cls.client_username = "some_username"
+        cls.random_ip = "10.0.0.2"
+        cls.random_port = 5050
+        cls.fake_client_username = "fake_client_username"
+
+        # log_current_date as it appears in the log lines, rendered once for all the tests
+        cls.log_current_date_str = "2022-12-04 22:59:15.009274"
+        cls.sample_log_filename = _log_name(cls.log_current_date)
+
+        # expected log lines; d is the date the line begins with, ip and port are the address the event refers to. They
+        # describe the intended log format - the tests of the lines log() does not write like this yet are marked as
+        # expected failures
+        cls.TPL_STARTING = "{d} [STARTING] Server is booting up..."
+        cls.TPL_STARTED = "{d} [STARTED] Server started. {vars}"
+        cls.TPL_LISTENING = "{d} [LISTENING] Server is listening at on {ip}:{port}"
+        cls.TPL_ATTEMPTED_CONNECTION = "{d} [ATTEMPTED_CONNECTION] Attempted connection from {ip}:{port}."
+        cls.TPL_ATTEMPTED_CONNECTION_REJECTED = cls.TPL_ATTEMPTED_CONNECTION + " Rejected. Reason: '{reason}'"
+        cls.TPL_NEW_CLIENT = "{d} [NEW CLIENT] New client accepted {ip}:{port} as '{username}'"
+        cls.TPL_ACTIVE_CLIENT = "'{username}' {ip}:{port}"
+        cls.TPL_ACTIVE_CLIENTS = "{d} [ACTIVE CLIENTS] Currently active clients: {clients}"
+        cls.TPL_CLIENT_DISCONNECTED = "{d} [CLIENT DISCONNECTED] Client '{username}' {ip}:{port} disconnected."
+        cls.TPL_MESSAGE_RECEIVED = "{d} [MESSAGE RECEIVED] Received message message_id='{message_id}', client_name=" \
+                                   "'{client_name}', timestamps.client_sent={client_sent}, timestamps.server_" \
+                                   "received={server_received}, message='{message}', broadcasted.0.client_name=" \
+                                   "'{recipient_name}', broadcasted.0.client_connected={recipient_connected}"
+        cls.TPL_MESSAGE_DISPATCHED = "{d} [MESSAGE DISPATCHED] Dispatched message '{message_id}' at " \
+                                     "{timestamp}."
+        cls.TPL_MESSAGED_DELIVERED = "{d} [MESSAGED DELIVERED] Delivered message '{message_id}' at " \
+                                     "{timestamp}"
+        cls.TPL_MISSING_MESSAGE = "{d} [MISSING MESSAGE] Found message '{message_id}' sent but not delivered to " \
+                                  "'{username}' {ip}:{port}"
+        cls.TPL_SHUTTING_DOWN = "{d} [SHUTTING DOWN] Server is shutting down..."
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.log_file_path, ignore_errors=True)
+
+    def setUp(self) -> None:
+        # a server of its own for each test - it writes to the log file (a debug server would only print the lines) and
+        # no clients are left from the previous test
+        self.server = Server(
+            _Server__log_file_created_at=self.log_current_date,
+            _Server__log_dir=self.log_file_path
+        )
+
+        self.passcode = self.server.get_passcode()
+        self.server_addr = self.server.get_addr()
+
+        self.log_filenames = [self.server.log_filename]
+
+    def tearDown(self) -> None:
+        self.server.close()
+
+        # next test writes the log file again, read it fresh
+        linecache.clearcache()
+
+        for filename in self.log_filenames:
+            (self.log_file_path / filename).unlink(missing_ok=True)
+
+    def _read_single_log_line(self) -> str:
+        """
+        Return the only line of the sample log file (without the line break), fail if there are more lines in it. The
+        server is closed first - that writes out the lines still waiting in the log queue. The file is read through
+        linecache - it is opened again only if it changed since it was last read.
+        """
+        self.server.close()
+
+        path = str(self.log_file_path / self.sample_log_filename)
+
+        linecache.checkcache(path)
+
+        self.assertEqual('', linecache.getline(path, 2), "The log file contains more than one line.")
+
+        return linecache.getline(path, 1).rstrip('\n')
+
+    def test_log_text_file_path(self) -> None:
+        self.server.log(ServerEventTypes.STARTING, datetime.now())
+        self.server.close()
+
+        # written to the directory given to the server, not to log/ in the project directory
+        self.assertTrue(os.path.exists(self.log_file_path / self.server.log_filename))
+        self.assertEqual(self.log_file_path, self.server.log_dir)
+
+    def test_log_filename(self) -> None:
+        current_date = datetime.now()
+        server_test = Server(_Server__log_file_created_at=current_date, _Server__log_dir=self.log_file_path)
+        self.log_filenames.append(server_test.log_filename)
+
+        server_test.log(ServerEventTypes.STARTING, datetime.now())
+        server_test.close()
+
+        expected = _log_name(current_date)
+        actual = server_test.log_filename
+
+        self.assertEqual(expected, actual)
+        self.assertTrue(os.path.exists(self.log_file_path / expected))
+
+    def test_log_starting(self) -> None:
+        self.server.log(ServerEventTypes.STARTING, self.log_current_date)
+
+        expected = self.TPL_STARTING.format(d=self.log_current_date_str)
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_started(self) -> None:
+        some_global_vars = {
+            "CLIENT_LIMIT": 2,
+            "PASSCODE": self.passcode
+        }
+
+        self.server.log(ServerEventTypes.STARTED, self.log_current_date, vars=some_global_vars)
+
+        expected = self.TPL_STARTED.format(
+            d=self.log_current_date_str,
+            vars=[f'{k} = {v}' for k, v in some_global_vars]
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    def test_log_started_run_time_variables(self) -> None:
+        self.server.log(ServerEventTypes.STARTED, self.log_current_date, CLIENT_LIMIT=2, TIMEOUT_SECONDS=5)
+
+        actual = self._read_single_log_line()
+
+        self.assertIn("CLIENT_LIMIT=2, TIMEOUT_SECONDS=5", actual)
+
+    @unittest.expectedFailure
+    def test_log_listening(self) -> None:
+        self.server.log(ServerEventTypes.LISTENING, self.log_current_date, server_addr=self.server_addr)
+
+        expected = self.TPL_LISTENING.format(d=self.log_current_date_str, ip=self.server_addr[0], port=self.server_addr[1])
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_attempted_connection_accepted(self) -> None:
+        self.server.log(
+            ServerEventTypes.ATTEMPTED_CONNECTION,
+            self.log_current_date,
+            client_addr=self.client_addr,
+            accepted=True
+        )
+
+        expected = self.TPL_ATTEMPTED_CONNECTION.format(
+            d=self.log_current_date_str,
+            ip=self.client_addr[0],
+            port=self.client_addr[1]
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_attempted_connection_rejected(self) -> None:
+        self.server.log(
+            ServerEventTypes.ATTEMPTED_CONNECTION,
+            self.log_current_date,
+            client_addr=self.client_addr,
+            accepted=False,
+            reason="reached max number of clients (2)"
+        )
+
+        expected = self.TPL_ATTEMPTED_CONNECTION_REJECTED.format(
+            d=self.log_current_date_str,
+            ip=self.client_addr[0],
+            port=self.client_addr[1],
+            reason="reached max number of clients (2)"
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_new_client(self) -> None:
+        self.server.log(ServerEventTypes.NEW_CLIENT, self.log_current_date, client_addr=self.client_addr, client_username=self.client_username)
+
+        expected = self.TPL_NEW_CLIENT.format(
+            d=self.log_current_date_str,
+            ip=self.client_addr[0],
+            port=self.client_addr[1],
+            username=self.client_username
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_active_clients(self) -> None:
+        self.server.clients_list = [
+            approved_client(self.client_username, self.client_addr),
+            approved_client(self.fake_client_username, (self.random_ip, self.random_port))
+        ]
+
+        self.server.log(ServerEventTypes.ACTIVE_CLIENTS, self.log_current_date)
+
+        expected = self.TPL_ACTIVE_CLIENTS.format(
+            d=self.log_current_date_str,
+            clients=", ".join((
+                self.TPL_ACTIVE_CLIENT.format(
+                    username=self.client_username,
+                    ip=self.client_addr[0],
+                    port=self.client_addr[1]
+                ),
+                self.TPL_ACTIVE_CLIENT.format(
+                    username=self.fake_client_username,
+                    ip=self.random_ip,
+                    port=self.random_port
+                )
+            ))
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_client_disconnected(self) -> None:
+        self.server.clients_list = [approved_client(self.client_username, self.client_addr)]
+
+        self.server.log(ServerEventTypes.CLIENT_DISCONNECTED, self.log_current_date, client_username=self.client_username, client_addr=self.client_addr)
+
+        expected = self.TPL_CLIENT_DISCONNECTED.format(
+            d=self.log_current_date_str,
+            username=self.client_username,
+            ip=self.client_addr[0],
+            port=self.client_addr[1]
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_message_received(self) -> None:
+        message = {
+            "client_name": "foo",
+            "timestamps": {
+                "client_sent": datetime.now(),
+                "server_received": datetime.now(),
+            },
+            "message": "bar",
+            "broadcasted": [
+                {
+                    "client_name": "bar",
+                    "client_connected": True
+                }
+            ],
+            "message_id": "123"
+        }
+
+        self.server.log(ServerEventTypes.MESSAGE_RECEIVED, self.log_current_date, message=message)
+
+        expected = self.TPL_MESSAGE_RECEIVED.format(
+            d=self.log_current_date_str,
+            message_id="123",
+            client_name="foo",
+            client_sent=message['timestamps']['client_sent'],
+            server_received=message['timestamps']['server_received'],
+            message="bar",
+            recipient_name="bar",
+            recipient_connected=True
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_message_dispatched(self) -> None:
+        self.server.log(ServerEventTypes.MESSAGE_DISPATCHED, self.log_current_date, message_id='123', timstamp=self.log_current_date)
+
+        expected = self.TPL_MESSAGE_DISPATCHED.format(
+            d=self.log_current_date_str,
+            message_id='123',
+            timestamp=self.log_current_date_str
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_messaged_delivered(self) -> None:
+        self.server.log(ServerEventTypes.MESSAGED_DELIVERED, self.log_current_date, message_id='123', timstamp=self.log_current_date)
+
+        expected = self.TPL_MESSAGED_DELIVERED.format(
+            d=self.log_current_date_str,
+            message_id='123',
+            timestamp=self.log_current_date_str
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_missing_message(self) -> None:
+        self.server.log(ServerEventTypes.MISSING_MESSAGE, self.log_current_date, message_id='123', client_add=self.client_addr, client_username=self.client_username)
+
+        expected = self.TPL_MISSING_MESSAGE.format(
+            d=self.log_current_date_str,
+            message_id='123',
+            username=self.client_username,
+            ip=self.client_addr[0],
+            port=self.client_addr[1]
+        )
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
+
+    @unittest.expectedFailure
+    def test_log_shutting_down(self) -> None:
+        self.server.log(ServerEventTypes.SHUTTING_DOWN, self.log_current_date)
+
+        expected = self.TPL_SHUTTING_DOWN.format(d=self.log_current_date_str)
+
+        actual = self._read_single_log_line()
+
+        self.assertEqual(expected, actual)
 
 
 if __name__ == "__main__":
@@ -2,40 +2,72 @@ import unittest
 from datetime import datetime, time, date
 from src.message_handler import SortByDate
 import random
-from math import floor
+
+
+# fixed point in time for tests that need any date / time / datetime value
+_NOW = datetime(2024, 1, 1, 12, 0, 0, 123456)
+_NOW_DATE = _NOW.date()
+_NOW_TIME = _NOW.time()
+
+# 01:01:00 to 01:01:02.900000 every 0.1 s
+_TIME_FIXTURE = [time(1, 1, *divmod(us, 1000000)) for us in range(0, 3000000, 100000)]
+
+# 2019-01-01 to 2019-10-19, dates go up with i
+_DATE_FIXTURE = [date(2019, 1 + i // 28, 1 + i % 28) for i in range(0, 280, 10)]
 
 
 class TestSortByDate(unittest.TestCase):
-    def setUp(self) -> None:
-        self.timestamp_key = "timestamp"
-        self.datetime_dict_list = [
-            {
-                self.timestamp_key: datetime(
-                    2019,
-                    int(1 + floor(i / 28)),
-                    1 + i % 28,
-                    random.randint(1, 23),
-                    random.randint(1, 59),
-                    random.randint(1, 59),
-                    random.randint(1, 999999),
-                )
-            } for i in range(0, 10, 280)
+    # values of i the datetime_dict_list entries are built from
+    DATETIME_LIST_INDICES = range(0, 280, 10)
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # own generator with a fixed seed - the random inputs are the same on every run (a failure can be reproduced
+        # exactly) and the global random state is left alone
+        cls._rng = random.Random(0xC0FFEE)
+
+        cls.timestamp_key = "timestamp"
+        n = len(cls.DATETIME_LIST_INDICES)
+
+        # random time of the day for each entry, one choices() call per field
+        hours = cls._rng.choices(range(1, 24), k=n)
+        minutes = cls._rng.choices(range(1, 60), k=n)
+        seconds = cls._rng.choices(range(1, 60), k=n)
+        microseconds = cls._rng.choices(range(1, 1000000), k=n)
+
+        # dates go up with i, hence the list is sorted; tests do not modify it, so it is built once for all of them
+        cls.datetime_dict_list = [
+            {cls.timestamp_key: datetime(2019, 1 + i // 28, 1 + i % 28, *hmsu)}
+            for i, *hmsu in zip(cls.DATETIME_LIST_INDICES, hours, minutes, seconds, microseconds)
         ]
 
+    def assertListEqualFast(self, first: list, second: list) -> None:
+        """
+        assertEqual() for lists of the same objects in the same order (sort_by_date() does not copy the entries). Checks
+        identity of the elements first and falls back to assertEqual() only if that fails.
+        """
+        if first is second:
+            return
+
+        if len(first) == len(second) and all(x is y for x, y in zip(first, second)):
+            return
+
+        self.assertEqual(first, second)
+
     def test_find_datetime_value_key_just_date(self) -> None:
-        input_val = {"key1": "foo", "key2": 5, "key3": datetime.now().date()}
+        input_val = {"key1": "foo", "key2": 5, "key3": _NOW_DATE}
         expected = ["key3"]
         actual = SortByDate.find_datetime_value_key(input_val)[0]
         self.assertEqual(expected, actual)
 
     def test_find_datetime_value_key_just_time(self) -> None:
-        input_val = {"key1": datetime.now().time(), "key2": "foo", "key3": 5}
+        input_val = {"key1": _NOW_TIME, "key2": "foo", "key3": 5}
         expected = ["key1"]
         actual = SortByDate.find_datetime_value_key(input_val)[0]
         self.assertEqual(expected, actual)
 
     def test_find_datetime_value_key_datetime(self) -> None:
-        input_val = {"key1": "foo", "key2": datetime.now(), "key3": 5}
+        input_val = {"key1": "foo", "key2": _NOW, "key3": 5}
         expected = ["key2"]
         actual = SortByDate.find_datetime_value_key(input_val)[0]
         self.assertEqual(expected, actual)
@@ -48,7 +80,7 @@ class TestSortByDate(unittest.TestCase):
 
     def test_sort_by_date_single_entry(self) -> None:
         datetime_key = "foo"
-        datetime_val = datetime.now().time()
+        datetime_val = _NOW_TIME
         input_val = [{datetime_key: datetime_val, "key2": "foo", "key3": 5}]
 
         expected = input_val
@@ -56,32 +88,23 @@ class TestSortByDate(unittest.TestCase):
 
         self.assertEqual(expected, actual)
 
-    def test_sort_by_date_multiple_entries_just_time(self) -> None:
-        datetime_key = "foo"
-
-        expected = [{datetime_key: time(1, 1, int(floor(i / 1000000)), i % 1000000)} for i in range(0, 3000000, 100000)]
-        input_val = random.sample(expected, len(expected))  # randomise order of entries
-        actual = SortByDate.sort_by_date(input_val, datetime_key)
-
-        self.assertEqual(expected, actual)
-
-    def test_sort_by_date_multiple_entries_just_date(self) -> None:
-        datetime_key = "bar"
-
-        expected = [{datetime_key: date(2019, int(1 + floor(i / 28)), 1 + i % 28)} for i in range(0, 280, 10)]
-        input_val = random.sample(expected, len(expected))  # randomise order of entries
-        actual = SortByDate.sort_by_date(input_val, datetime_key)
+    def test_sort_by_date_multi(self) -> None:
+        cases = (
+            ("time", [{"foo": t} for t in _TIME_FIXTURE]),
+            ("date", [{"foo": d} for d in _DATE_FIXTURE]),
+            ("datetime", self.datetime_dict_list),
+            ("same_datetime", [self.datetime_dict_list[0] for _ in range(30)]),
+        )
 
-        self.assertEqual(expected, actual)
+        for name, expected in cases:
+            with self.subTest(name=name):
+                datetime_key = next(iter(expected[0]))
 
-    def test_sort_by_date_multiple_entries_datetime(self) -> None:
-        datetime_key = self.timestamp_key
-        input_val = random.sample(self.datetime_dict_list, len(self.datetime_dict_list))
+                input_val = list(expected)
+                self._rng.shuffle(input_val)  # randomise order of entries
+                actual = SortByDate.sort_by_date(input_val, datetime_key)
 
-        expected = self.datetime_dict_list
-        actual = SortByDate.sort_by_date(input_val, datetime_key)
-
-        self.assertEqual(expected, actual)
+                self.assertListEqualFast(expected, actual)
 
     def test_sort_by_date_multiple_entries_sorted(self) -> None:
         datetime_key = self.timestamp_key
@@ -89,15 +112,7 @@ class TestSortByDate(unittest.TestCase):
         expected = self.datetime_dict_list
         actual = SortByDate.sort_by_date(expected, datetime_key)
 
-        self.assertEqual(expected, actual)
-
-    def test_sort_by_date_multiple_entries_same_datetime(self) -> None:
-        datetime_key = self.timestamp_key
-
-        expected = [self.datetime_dict_list[0] for _ in range(30)]
-        actual = SortByDate.sort_by_date(expected, datetime_key)
-
-        self.assertEqual(expected, actual)
+        self.assertListEqualFast(expected, actual)
 
     def test_find_datetime_value_key_embedded_timestamp_field(self) -> None:
         _list = []
@@ -117,7 +132,8 @@ class TestSortByDate(unittest.TestCase):
         keys = ["foo", self.timestamp_key]
 
         expected = _list
-        input_list = random.sample(_list, len(_list))
+        input_list = list(_list)
+        self._rng.shuffle(input_list)
         actual = SortByDate.sort_by_date(input_list, *keys)
 
         self.assertEqual(expected, actual)